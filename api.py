@@ -0,0 +1,216 @@
+import datetime
+import json
+
+from flask import Blueprint, Response, abort, current_app, jsonify, request, stream_with_context
+
+from database import (Exam, current_owner, db, decode_cursor, exam_changes, exam_version, exams_filtered, exams_page,
+                      oldest_change_version, parse_exam_fields, run_write)
+
+# API JSON versionada para clientes (móvil, sincronización de calendarios).
+# Cada petición ve y modifica solo los exámenes del usuario actual.
+api = Blueprint("api_v1", __name__, url_prefix="/api/v1")
+
+# Nombre en la API -> atributo del modelo; "subject" como en el formulario y la importación.
+FIELDS = {
+    "id": "id",
+    "subject": "name",
+    "test_type": "test_type",
+    "room": "room",
+    "date": "date",
+    "completed": "completed",
+}
+UPDATABLE = ("subject", "test_type", "room", "date")
+MAX_BATCH = 1000
+MAX_CHANGES = 1000
+STREAM_BATCH_SIZE = 500
+TRUE_VALUES = ("1", "true", "si", "sí")
+FALSE_VALUES = ("0", "false", "no")
+
+
+def exam_to_dict(exam, fields=tuple(FIELDS)):
+    data = {}
+    for field in fields:
+        value = getattr(exam, FIELDS[field])
+        data[field] = value.isoformat() if isinstance(value, datetime.date) else value
+    return data
+
+
+def requested_fields():
+    fields = request.args.get("fields")
+    if not fields:
+        return tuple(FIELDS)
+    fields = tuple(field.strip() for field in fields.split(",") if field.strip())
+    unknown = [field for field in fields if field not in FIELDS]
+    if unknown:
+        abort(400, f"Campos desconocidos: {', '.join(unknown)}")
+    return fields
+
+
+def _date_arg(name):
+    value = request.args.get(name)
+    try:
+        return datetime.date.fromisoformat(value) if value else None
+    except ValueError:
+        abort(400, f"Fecha inválida en '{name}'. Usa AAAA-MM-DD")
+
+
+def parse_completed(value):
+    # Booleanos JSON, 0/1 o los mismos textos que acepta el filtro; bool("false") sería True.
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (str, int)):
+        text = str(value).strip().lower()
+        if text in TRUE_VALUES:
+            return True
+        if text in FALSE_VALUES:
+            return False
+    raise ValueError(f"'completed' debe ser true o false, no {value!r}.")
+
+
+def filtered_query():
+    query = exams_filtered(_date_arg("start"), _date_arg("end"), request.args.get("subject"), current_owner())
+    completed = request.args.get("completed")
+    if completed is not None:
+        try:
+            query = query.filter(Exam.completed == parse_completed(completed))
+        except ValueError as e:
+            abort(400, str(e))
+    return query
+
+
+def wants_ndjson():
+    return (request.args.get("format") == "ndjson"
+            or request.accept_mimetypes.best == "application/x-ndjson")
+
+
+@api.errorhandler(400)
+@api.errorhandler(404)
+@api.errorhandler(410)
+@api.errorhandler(413)
+def json_error(error):
+    return jsonify(error=error.description), error.code
+
+
+@api.route("/exams")
+def list_exams():
+    fields = requested_fields()
+    query = filtered_query()
+    version = exam_version()
+    if wants_ndjson():
+        # Volcado completo por lotes, una línea JSON por examen y sin paginar.
+        def lines():
+            for exam in query.yield_per(STREAM_BATCH_SIZE):
+                yield json.dumps(exam_to_dict(exam, fields), ensure_ascii=False) + "\n"
+
+        return Response(stream_with_context(lines()), mimetype="application/x-ndjson",
+                        headers={"X-Exams-Version": str(version)})
+    try:
+        after = decode_cursor(request.args["after"]) if request.args.get("after") else None
+    except ValueError:
+        abort(400, "Cursor inválido.")
+    limit = request.args.get("limit", current_app.config["EXAMS_PER_PAGE"], type=int)
+    limit = max(1, min(limit, current_app.config["EXAMS_MAX_PER_PAGE"]))
+    exams, next_cursor = exams_page(query, after, limit)
+    return jsonify(version=version, items=[exam_to_dict(exam, fields) for exam in exams], next=next_cursor)
+
+
+def owned_exam(id, owner):
+    exam = db.session.get(Exam, id) if isinstance(id, int) else None
+    return exam if exam is not None and exam.owner == owner else None
+
+
+@api.route("/exams/<int:id>")
+def get_exam(id):
+    exam = owned_exam(id, current_owner())
+    if exam is None:
+        abort(404, "No existe el examen.")
+    return jsonify(exam_to_dict(exam, requested_fields()))
+
+
+def _update(exam, item):
+    data = {"subject": exam.name, "test_type": exam.test_type, "room": exam.room, "date": exam.date.isoformat()}
+    data.update({field: item[field] for field in UPDATABLE if field in item})
+    for key, value in parse_exam_fields(data).items():
+        setattr(exam, key, value)
+    if "completed" in item:
+        exam.completed = parse_completed(item["completed"])
+
+
+@api.route("/exams/batch", methods=["POST"])
+def batch():
+    # {"create": [...], "update": [{"id": 1, ...}], "delete": [ids]} en una sola
+    # transacción: si una operación falla no se aplica ninguna.
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        abort(400, "Se esperaba un objeto JSON.")
+    creates, updates, deletes = body.get("create", []), body.get("update", []), body.get("delete", [])
+    if not all(isinstance(part, list) for part in (creates, updates, deletes)):
+        abort(400, "create, update y delete deben ser listas.")
+    if len(creates) + len(updates) + len(deletes) > MAX_BATCH:
+        abort(413, f"Máximo {MAX_BATCH} operaciones por lote.")
+    owner = current_owner()
+
+    def work():
+        created = []
+        for i, item in enumerate(creates):
+            try:
+                exam = Exam(**parse_exam_fields(item), owner=owner)
+                exam.completed = parse_completed(item.get("completed", False))
+            except (ValueError, AttributeError) as e:
+                raise ValueError(f"create[{i}]: {e}")
+            db.session.add(exam)
+            created.append(exam)
+        for i, item in enumerate(updates):
+            exam = owned_exam(item.get("id"), owner) if isinstance(item, dict) else None
+            if exam is None:
+                raise LookupError(f"update[{i}]: no existe el examen.")
+            try:
+                _update(exam, item)
+            except ValueError as e:
+                raise ValueError(f"update[{i}]: {e}")
+        for i, exam_id in enumerate(deletes):
+            exam = owned_exam(exam_id, owner)
+            if exam is None:
+                raise LookupError(f"delete[{i}]: no existe el examen {exam_id}.")
+            db.session.delete(exam)
+        db.session.flush()
+        return [exam.id for exam in created]
+
+    try:
+        created = run_write(work)
+    except (ValueError, LookupError) as e:
+        status = 404 if isinstance(e, LookupError) else 400
+        return jsonify(error=str(e)), status
+    return jsonify(version=exam_version(), created=created, updated=len(updates), deleted=len(deletes))
+
+
+@api.route("/changes")
+def changes():
+    # Cambios posteriores a `since`: por examen se informa solo su estado actual
+    # (o que fue eliminado). El cliente guarda `next_since` para la siguiente llamada.
+    since = request.args.get("since", 0, type=int)
+    limit = max(1, min(request.args.get("limit", MAX_CHANGES, type=int), MAX_CHANGES))
+    owner = current_owner()
+    version = exam_version()
+    oldest = oldest_change_version()
+    if since < version and (oldest is None or since < oldest - 1):
+        abort(410, "El registro de cambios ya no cubre esa versión; descarga todo de nuevo.")
+    entries = exam_changes(since, limit, owner)
+    latest = {}
+    for entry in entries:
+        latest.pop(entry.exam_id, None)
+        latest[entry.exam_id] = entry.version
+    exams = {exam.id: exam for exam in Exam.query.filter(Exam.id.in_(latest), Exam.owner == owner)} if latest else {}
+    fields = requested_fields()
+    items = []
+    for exam_id, changed_at in latest.items():
+        exam = exams.get(exam_id)
+        if exam is None:
+            items.append({"id": exam_id, "version": changed_at, "deleted": True})
+        else:
+            items.append({"id": exam_id, "version": changed_at, "deleted": False, "exam": exam_to_dict(exam, fields)})
+    more = len(entries) == limit
+    # Sin más cambios del usuario se avanza hasta la versión leída al principio,
+    # para no volver a recorrer los cambios de otros usuarios.
+    next_since = entries[-1].version if more else max([since, version] + [e.version for e in entries[-1:]])
+    return jsonify(version=version, changes=items, next_since=next_since, more=more)
@@ -1,11 +1,25 @@
+import argparse
 import datetime
+import getpass
+import importlib
 import json
 import os
+import sys
 import time
 
-from flask import Flask, flash, redirect, render_template, request, url_for
-from apscheduler.schedulers.background import BackgroundScheduler
-from plyer import notification
+# Hora de inicio, para el reporte de --profile-startup.
+_STARTED = time.perf_counter()
+
+from conflicts import DEFAULT_MAX_PER_DAY, day_overloads, room_clashes
+from dispatch import Notification, NotificationDispatcher, PlyerBackend, SentLedger, notification_text
+from ics_export import ICS_EXTENSION, iter_ics, reminder_events
+from metrics import REGISTRY, track_job
+from recurrence import occurrences
+from reminder_record import Priority, Reminder
+from snapshot import SNAPSHOT_EXTENSION, SnapshotError, open_snapshot, write_snapshot
+from user_shards import ShardStore, UserShard
+
+_CLI_IMPORTED = time.perf_counter()
 
 # Colores para la consola
 class Colors:
@@ -16,7 +30,65 @@ class Colors:
     FAIL = '\033[91m'
     END = '\033[0m'
 
-app = Flask(__name__, template_folder='.')
+# Estado persistente del CLI (por ahora, si el tutorial ya se completó).
+STATE_PATH = os.path.join(os.path.expanduser("~"), ".recordatorios_examenes.json")
+
+# Módulos pesados que solo se cargan cuando se usa la función correspondiente.
+# Solo bibliotecas: importar web.py crearía o migraría la base de datos y
+# arrancaría el programador, y medir el arranque no debe tener efectos.
+# Cada módulo se mide después de sus dependencias de la lista, así el tiempo
+# de cada uno es solo lo que agrega.
+LAZY_STACKS = {
+    "web": ["sqlalchemy", "flask", "flask_sqlalchemy"],
+    "programador": ["apscheduler", "apscheduler.schedulers.background"],
+    "notificaciones": ["plyer"],
+}
+
+
+def __getattr__(name):
+    # `flask --app app` sigue funcionando: la app web se importa recién aquí.
+    if name == "app":
+        from web import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def load_state():
+    try:
+        with open(STATE_PATH, "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def save_state(state):
+    try:
+        with open(STATE_PATH, "w") as f:
+            json.dump(state, f)
+    except OSError as e:
+        print(f"{Colors.FAIL}No se pudo guardar el estado en {STATE_PATH}: {e}{Colors.END}")
+
+
+def profile_startup():
+    print(f"\n{Colors.HEADER}Tiempos de arranque{Colors.END}")
+    print(f"{Colors.BLUE}Módulos del CLI: {(_CLI_IMPORTED - _STARTED) * 1000:.1f} ms{Colors.END}")
+    deferred = 0.0
+    for stack, modules in LAZY_STACKS.items():
+        for module in modules:
+            if module in sys.modules:
+                print(f"  {stack}: {module} ya cargado por un módulo anterior")
+                continue
+            began = time.perf_counter()
+            try:
+                importlib.import_module(module)
+            except ImportError as e:
+                print(f"{Colors.WARNING}  {stack}: {module} no disponible ({e}){Colors.END}")
+                continue
+            elapsed = time.perf_counter() - began
+            deferred += elapsed
+            print(f"  {stack}: {module} {elapsed * 1000:.1f} ms")
+    print(f"{Colors.GREEN}Carga diferida total: {deferred * 1000:.1f} ms (no se paga al iniciar el CLI).{Colors.END}")
+
 
 def show_tutorial():
     def tutorial_section(title, content, expected_answer="si"):
@@ -96,18 +168,63 @@ def show_tutorial():
     )
 
 
-reminders = []
+# Se crea en main(): abrir el registro de enviados escribe en disco, y ni
+# importar este módulo (web.py lo hace) ni --profile-startup deben hacerlo.
+dispatcher = None
+# Días hacia adelante en que se revisan las ocurrencias de los recurrentes.
+CONFLICT_WINDOW_DAYS = 365
+
+# Los recordatorios y sus índices son los del usuario activo (activate_user).
+# Hasta que se elige un usuario se usa un shard solo en memoria.
+shards = ShardStore()
+shard = UserShard(None)
+reminders = shard.reminders
+reminder_index = shard.reminder_index
+search_index = shard.search_index
+room_index = shard.room_index
+
+
+def default_user():
+    return os.environ.get("EXAMS_USER") or getpass.getuser()
+
+
+def activate_user(user):
+    global shard, reminders, reminder_index, search_index, room_index
+    try:
+        shard = shards.get(user)
+    except (OSError, ValueError) as e:
+        print(f"{Colors.FAIL}No se pudieron cargar los recordatorios de {user}: {e}{Colors.END}")
+        return False
+    reminders = shard.reminders
+    reminder_index = shard.reminder_index
+    search_index = shard.search_index
+    room_index = shard.room_index
+    return True
+
+
+
+def confirm_room_clash(room, date, exclude=None):
+    clashes = room_index.clashes(room, date.toordinal(), exclude)
+    if not clashes:
+        return True
+    print(f"{Colors.WARNING}La sala {room} ya está ocupada el {date.strftime('%Y-%m-%d')} por:{Colors.END}")
+    for other in clashes:
+        print(f"{Colors.WARNING}  - {other.subject} ({other.test_type}){Colors.END}")
+    return input("¿Desea guardarlo de todas formas? (si/no): ").lower() in ["si", "y"]
 
 
 def save_reminders_to_file():
     while True:
-        filename = input("Ingrese el nombre del archivo para guardar los recordatorios (ej: backup.json): ")
-        if not filename.endswith('.json'):
-            print(f"{Colors.FAIL}Error: El nombre del archivo debe terminar con '.json'{Colors.END}")
+        filename = input(f"Ingrese el nombre del archivo para guardar los recordatorios (ej: backup.json o backup{SNAPSHOT_EXTENSION}): ")
+        if not filename.endswith(('.json', SNAPSHOT_EXTENSION)):
+            print(f"{Colors.FAIL}Error: El nombre del archivo debe terminar con '.json' o '{SNAPSHOT_EXTENSION}'{Colors.END}")
         else:
             try:
-                with open(filename, "w") as f:
-                    json.dump(reminders, f, indent=4, default=str)
+                if filename.endswith(SNAPSHOT_EXTENSION):
+                    write_snapshot(filename, reminders)
+                else:
+                    with open(filename, "w") as f:
+                        json.dump([reminder.to_dict() for reminder in reminders], f, indent=4, default=str)
 
                 print(
                     f"{Colors.GREEN}Recordatorios guardados con éxito en {filename}{Colors.END}"
@@ -120,14 +237,21 @@ def save_reminders_to_file():
 def load_reminders_from_file(filename):
     if os.path.exists(filename):
         try:
-            with open(filename, "r") as f:
-                data = json.load(f)
-                reminders.clear()
-                reminders.extend(data)
-                print(
-                    f"{Colors.GREEN}Recordatorios cargados con éxito desde {filename}{Colors.END}"
-                )
-        except json.JSONDecodeError:
+            if filename.endswith(SNAPSHOT_EXTENSION):
+                # Cargar reemplaza todo: los índices y el snapshot del diario
+                # necesitan cada registro, así que aquí se decodifica completo y
+                # el mapa se cierra enseguida (en Windows no se puede reemplazar
+                # un archivo mapeado).
+                with open_snapshot(filename) as snapshot:
+                    data = list(snapshot.records())
+            else:
+                with open(filename, "r") as f:
+                    data = [Reminder.from_dict(item) for item in json.load(f)]
+            shard.reset(data)
+            print(
+                f"{Colors.GREEN}Recordatorios cargados con éxito desde {filename}{Colors.END}"
+            )
+        except (json.JSONDecodeError, SnapshotError, KeyError, ValueError):
             print(
                 f"{Colors.FAIL}Error: El archivo {filename} no contiene datos válidos.{Colors.END}"
             )
@@ -136,20 +260,52 @@ def load_reminders_from_file(filename):
 
 def export_reminders_to_text():
     while True:
-        filename = input("Ingrese el nombre del archivo para exportar los recordatorios (ej: calendar_export.txt): ")
-        if not filename.endswith('.txt'):
-            print(f"{Colors.FAIL}Error: El nombre del archivo debe terminar con '.txt'.{Colors.END}")
+        filename = input(f"Ingrese el nombre del archivo para exportar los recordatorios (ej: calendar_export.txt o calendar{ICS_EXTENSION}): ")
+        if not filename.endswith(('.txt', ICS_EXTENSION)):
+            print(f"{Colors.FAIL}Error: El nombre del archivo debe terminar con '.txt' o '{ICS_EXTENSION}'.{Colors.END}")
+        elif filename.endswith(ICS_EXTENSION):
+            return export_reminders_to_ics(filename)
         else:
             try:
                 with open(filename, "w") as f:
                     for reminder in reminders:
-                        f.write(f"{reminder.date.isoformat()} - {reminder.subject} ({reminder.test_type}) en {reminder.room}\n")
+                        f.write(f"{reminder.date_str} - {reminder.subject} ({reminder.test_type}) en {reminder.room}\n")
                 print(f"{Colors.GREEN}Recordatorios exportados a {filename} con éxito.{Colors.END}")
                 return filename
             except Exception as e:
                 print(f"{Colors.FAIL}Error al exportar recordatorios: {e}{Colors.END}")
 
 
+def read_optional_date(prompt):
+    while True:
+        date_str = input(prompt)
+        if not date_str:
+            return None
+        try:
+            return datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
+        except ValueError:
+            print(f"{Colors.FAIL}Formato de fecha incorrecto. Usa AAAA-MM-DD{Colors.END}")
+
+
+def export_reminders_to_ics(filename):
+    start = read_optional_date("Exportar desde la fecha (AAAA-MM-DD, vacío para no filtrar): ")
+    end = read_optional_date("Exportar hasta la fecha (AAAA-MM-DD, vacío para no filtrar): ")
+    subject = input("Exportar solo la materia (vacío para todas): ")
+    allowed = {id(r) for r in search_index.search(subject=subject)} if subject else None
+    # Se escribe a un temporal para no dejar un calendario a medias si falla.
+    tmp_path = filename + ".tmp"
+    try:
+        with open(tmp_path, "w", newline="") as f:
+            f.writelines(iter_ics(reminder_events(reminders, reminder_index, start, end, allowed)))
+        os.replace(tmp_path, filename)
+        print(f"{Colors.GREEN}Recordatorios exportados a {filename} con éxito.{Colors.END}")
+        return filename
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        print(f"{Colors.FAIL}Error al exportar recordatorios: {e}{Colors.END}")
+
+
 def show_upcoming_exams():
     while True:
         try:
@@ -162,25 +318,15 @@ def show_upcoming_exams():
             print(f"{Colors.FAIL}Por favor, ingrese un número válido.{Colors.END}")
 
     today = datetime.date.today()
-    upcoming_exams = [exam for exam in reminders if (datetime.datetime.strptime(exam['date'], "%Y-%m-%d").date() - today).days <= days_to_check]
-    upcoming_exams.sort(key=lambda x: x['date'])
+    upcoming_exams = list(reminder_index.upcoming(days_to_check, today))
     if upcoming_exams:
         print(f"\nPróximos Exámenes en los próximos {days_to_check} días:")
-        for exam in upcoming_exams:
-            exam_date = datetime.datetime.strptime(exam['date'], "%Y-%m-%d").date()
+        for exam_date, exam in upcoming_exams:
             days_until = (exam_date - today).days
-            print(f"{Colors.GREEN}  - {exam['subject']} ({exam['test_type']}) en {exam['room']} el {exam['date']}. {days_until} días restantes.{Colors.END}")
+            print(f"{Colors.GREEN}  - {exam.subject} ({exam.test_type}) en {exam.room} el {exam_date.strftime('%Y-%m-%d')}. {days_until} días restantes.{Colors.END}")
     else:
         print(f"{Colors.WARNING}\nNo hay exámenes próximos programados en los próximos {days_to_check} días.{Colors.END}")
         
-def show_notification(title, message):
-    notification.notify(
-        title=title,
-        message=message,
-        app_icon=None,  # Puedes especificar un icono si lo tienes
-        timeout=10  # Duración de la notificación en segundos
-    )
-
 def search_reminders():
     if not reminders:
         print(f"{Colors.WARNING}No hay recordatorios guardados.{Colors.END}")
@@ -190,34 +336,47 @@ def search_reminders():
     print(f"{Colors.BLUE}1. Buscar por materia{Colors.END}")
     print(f"{Colors.BLUE}2. Buscar por tipo de examen{Colors.END}")
     print(f"{Colors.BLUE}3. Buscar por fecha{Colors.END}")
-    print(f"{Colors.BLUE}4. Cancelar{Colors.END}")
+    print(f"{Colors.BLUE}4. Buscar por sala{Colors.END}")
+    print(f"{Colors.BLUE}5. Búsqueda combinada{Colors.END}")
+    print(f"{Colors.BLUE}6. Cancelar{Colors.END}")
     
     while True:
         try:
             option = int(input("Seleccione una opción: "))            
-            if option in [1, 2, 3, 4]:
+            if option in [1, 2, 3, 4, 5, 6]:
                 break
             else:
-                print(f"{Colors.FAIL}Opción no válida. Por favor, seleccione una opción del 1 al 4.{Colors.END}")
+                print(f"{Colors.FAIL}Opción no válida. Por favor, seleccione una opción del 1 al 6.{Colors.END}")
         except ValueError:
             print(f"{Colors.FAIL}Entrada no válida. Por favor, ingrese un número.{Colors.END}")
     
     results = []
     if option == 1:
         subject_to_search = input("Ingrese la materia a buscar: ")
-        results = [exam for exam in reminders if subject_to_search.lower() in exam['subject'].lower()]
+        results = search_index.search(subject=subject_to_search)
     elif option == 2:
         test_type_to_search = input("Ingrese el tipo de examen a buscar: ")
-        results = [exam for exam in reminders if test_type_to_search.lower() in exam['test_type'].lower()]
+        results = search_index.search(test_type=test_type_to_search)
     elif option == 3:
         date_to_search_str = input("Ingrese la fecha a buscar (AAAA-MM-DD): ")
         try:
             date_to_search = datetime.datetime.strptime(date_to_search_str, "%Y-%m-%d").date()
-            results = [exam for exam in reminders if datetime.datetime.strptime(exam['date'], "%Y-%m-%d").date() == date_to_search]
+            results = reminder_index.on(date_to_search)
         except ValueError:
             print(f"{Colors.FAIL}Formato de fecha incorrecto. Usa AAAA-MM-DD.{Colors.END}")
             return
     elif option == 4:
+        room_to_search = input("Ingrese la sala a buscar: ")
+        results = search_index.search(room=room_to_search)
+    elif option == 5:
+        print("Deje en blanco los criterios que no quiera usar.")
+        results = search_index.search(
+            subject=input("Materia: "),
+            test_type=input("Tipo de examen: "),
+            room=input("Sala: "),
+            prefix=input("¿Buscar solo por el comienzo del texto? (si/no): ").lower() in ["si", "y"],
+        )
+    elif option == 6:
         print(f"{Colors.WARNING}Búsqueda cancelada.{Colors.END}")
         return
     
@@ -226,7 +385,7 @@ def search_reminders():
     else:
         print(f"\n{Colors.GREEN}Resultados de la búsqueda:{Colors.END}")
         for exam in results:
-            print(f"{Colors.BLUE}- {exam['subject']} ({exam['test_type']}) en {exam['room']} el {exam['date']}{Colors.END}")
+            print(f"{Colors.BLUE}- {exam.subject} ({exam.test_type}) en {exam.room} el {exam.date_str}{Colors.END}")
 
 
 def add_reminder():
@@ -242,17 +401,13 @@ def add_reminder():
         except ValueError:
             print(f"{Colors.FAIL}Formato de fecha incorrecto. Usa AAAA-MM-DD{Colors.END}")
     
-    priority = input("Ingrese la prioridad del recordatorio (Alta, Media, Baja): ").lower()
-    if priority not in ["alta", "media", "baja"]:
-        priority = "baja"
-
-    reminder = {
-        "subject": subject,
-        "test_type": test_type,
-        "room": room,
-        "date": date.strftime("%Y-%m-%d"),
-        "priority": priority,
-    }
+    if not confirm_room_clash(room, date):
+        print(f"{Colors.WARNING}Operacion cancelada.{Colors.END}")
+        return
+
+    priority = Priority.parse(input("Ingrese la prioridad del recordatorio (Alta, Media, Baja): ").lower())
+
+    reminder = Reminder(subject, test_type, room, date.toordinal(), priority)
 
     while True:
         repeat = input("¿Quieres que el recordatorio se repita? (si/no): ").lower()
@@ -265,11 +420,11 @@ def add_reminder():
         while True:
             try:
                 frequency = int(input("¿Cada cuántos días quieres que se repita? "))
-                reminder["frequency"] = frequency
+                reminder.frequency = frequency
                 break
             except ValueError:
                 print(f"{Colors.FAIL}Valor invalido, ingrese un numero valido.{Colors.END}")
-    reminders.append(reminder)
+    shard.append(reminder)
     print(f"{Colors.GREEN}Recordatorio agregado con éxito.{Colors.END}")
 
 def edit_reminder():
@@ -290,151 +445,76 @@ def edit_reminder():
     print(f"{Colors.WARNING}¿Está seguro que desea editar este recordatorio? (si/no){Colors.END}")
     confirm = input().lower()
     if confirm == 'si' or confirm == 'y':
-        print(f"\n{Colors.HEADER}Editando recordatorio: {reminder['subject']} ({reminder['test_type']}){Colors.END}")
-        reminder['subject'] = input(f"Nuevo nombre de la materia ({reminder['subject']}): ") or reminder['subject']
-        reminder['test_type'] = input(f"Nuevo tipo de examen ({reminder['test_type']}): ") or reminder['test_type']
-        reminder['room'] = input(f"Nueva sala ({reminder['room']}): ") or reminder['room']
+        print(f"\n{Colors.HEADER}Editando recordatorio: {reminder.subject} ({reminder.test_type}){Colors.END}")
+        subject = input(f"Nuevo nombre de la materia ({reminder.subject}): ") or reminder.subject
+        test_type = input(f"Nuevo tipo de examen ({reminder.test_type}): ") or reminder.test_type
+        room = input(f"Nueva sala ({reminder.room}): ") or reminder.room
 
         while True:
-            date_str = input(f"Nueva fecha del examen (AAAA-MM-DD) ({reminder['date']}): ") or reminder['date']
+            date_str = input(f"Nueva fecha del examen (AAAA-MM-DD) ({reminder.date_str}): ") or reminder.date_str
             try:
                 date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
-                reminder['date'] = date.strftime("%Y-%m-%d")
                 break
             except ValueError:
                 print(f"{Colors.FAIL}Formato de fecha incorrecto. Usa AAAA-MM-DD{Colors.END}")
 
-        priority = input(f"Nueva prioridad del recordatorio (Alta, Media, Baja) ({reminder['priority']}): ").lower()
-        if priority not in ["alta", "media", "baja"]:
-            priority = "baja"
-        reminder['priority'] = priority
+        if not confirm_room_clash(room, date, exclude=reminder):
+            print(f"{Colors.WARNING}Operacion cancelada.{Colors.END}")
+            return
+
+        priority = Priority.parse(input(f"Nueva prioridad del recordatorio (Alta, Media, Baja) ({reminder.priority}): ").lower())
+        updated = Reminder(subject, test_type, room, date.toordinal(), priority, reminder.status, reminder.frequency)
+        shard.replace(reminder_number, updated)
+        print(f"{Colors.GREEN}Recordatorio editado con éxito.{Colors.END}")
     else:
         print(f"{Colors.WARNING}Operacion cancelada.{Colors.END}")
-    print(f"{Colors.GREEN}Recordatorio editado con éxito.{Colors.END}")
-            break
-        except ValueError:
-            print(f"{Colors.FAIL}Formato de fecha incorrecto. Usa AAAA-MM-DD{Colors.END}")
-
-    priority = input(f"Nueva prioridad del recordatorio (Alta, Media, Baja) ({reminder['priority']}): ").lower()
-    if priority not in ["alta", "media", "baja"]:
-        priority = "baja"
-    reminder['priority'] = priority
-
-    print(f"{Colors.GREEN}Recordatorio editado con éxito.{Colors.END}")
-
-# Ruta principal
-
-
-
-# Rutas para agregar un recordatorio
-@app.route('/add_reminder', methods=['GET', 'POST'])
-def add_reminder():
-    if request.method == 'POST':
-        subject = request.form['subject']
-        test_type = request.form['test_type']
-        room = request.form['room']
-        date_str = request.form['date']
-
-        if not all([subject, test_type, room, date_str]):
-            print(f"{Colors.FAIL}Por favor, completa todos los campos.{Colors.END}")
-            # flash('Por favor, completa todos los campos.', 'error')
-            return redirect(url_for('add_reminder'))
 
-        try:
-            date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
-        except ValueError:
-            print(f"{Colors.FAIL}Formato de fecha incorrecto. Usa AAAA-MM-DD{Colors.END}")
-
-            flash("Formato de fecha incorrecto. Usa AAAA-MM-DD", "error")
-            return redirect(url_for("add_reminder"))
-
-        new_reminder = {
-            "subject": subject,
-            "test_type": test_type,
-            "room": room,
-            "date": date}
-        try:
-            db.session.commit()
-        except Exception as e:
-        flash('Recordatorio eliminado con éxito.', 'success')
-    return redirect(url_for('index'))
-
-@app.route('/completed/<int:id>')
 def list_reminders():
+    today = datetime.date.today()
     for i, reminder in enumerate(reminders):
-        print(f"{Colors.BLUE}{i + 1}. {reminder['subject']} ({reminder['test_type']}) en {reminder['room']} el {reminder['date']}{Colors.END}")
+        repeats = ""
+        if reminder.frequency:
+            upcoming = next(occurrences(reminder.date, reminder.frequency, today, datetime.date.max), None)
+            repeats = f", se repite cada {reminder.frequency} días"
+            if upcoming:
+                repeats += f" (próxima: {upcoming.strftime('%Y-%m-%d')})"
+        print(f"{Colors.BLUE}{i + 1}. {reminder.subject} ({reminder.test_type}) en {reminder.room} el {reminder.date_str}{repeats}{Colors.END}")
 
 
-def complete_reminder(id):
-    reminder = Reminder.query.get(id)
-    if reminder:
-        reminder.completed = True
-        try:
-            db.session.commit()
-        except Exception as e:
-            print(f"{Colors.FAIL}Error al completar el recordatorio: {e}{Colors.END}")
-        
-        flash('Recordatorio completado con éxito.', 'success')
-    return redirect(url_for('index'))
-
-@app.route('/show_completed')
-def show_completed():
-    completed_reminders = Reminder.query.filter_by(completed=True).all()
-    filename = save_reminders_to_file()
-    print(f"{Colors.GREEN}Recordatorios guardados con éxito en {filename}{Colors.END}" if filename else "")
-    return redirect(url_for('index'))
-
-
-@app.route('/load_reminders')
-def load_reminders():
-    while True:
-        filename = input("Ingrese el nombre del archivo para cargar los recordatorios (ej: backup.json): ")
-        if  filename.endswith('.json'):
-             if os.path.exists(filename):
-                print(f"{Colors.WARNING}Se van a reemplazar los recordatorios actuales. ¿Está seguro que desea continuar? (si/no){Colors.END}")
-                confirm = input().lower()
-                if confirm == 'si' or confirm == "y":
-                    load_reminders_from_file(filename)
-                    print(f"{Colors.GREEN}Recordatorios cargados con éxito desde {filename}{Colors.END}")
-                    break
-                else:
-                    print(f"{Colors.WARNING}Operación cancelada.{Colors.END}")
-             else:
-                print(f"{Colors.FAIL}El archivo {filename} no existe.{Colors.END}")
-        else:
-            print(f"{Colors.FAIL}Error: El nombre del archivo debe terminar con '.json'{Colors.END}")            
-        print(f"{Colors.FAIL}El archivo {filename} no existe.{Colors.END}")
-    return redirect(url_for('index'))
-
-
-@app.route('/export_calendar')
-def export_calendar():
-    filename = export_reminders_to_text()
-
-
-    return redirect(url_for('index'))
-def upcoming_exams():
-    show_upcoming_exams()
-    flash('Exámenes próximos mostrados en la consola.', 'success')
-    return redirect(url_for('index'))
+def show_conflicts():
+    today = datetime.date.today()
+    end = today + datetime.timedelta(days=CONFLICT_WINDOW_DAYS)
+    entries = [(date, reminder.room, reminder) for date, reminder in reminder_index.between(today, end)
+               if not reminder.completed]
+    print(f"\n{Colors.HEADER}Choques de sala (mismo día y sala){Colors.END}")
+    found = False
+    for room, date, clashing in room_clashes(entries):
+        found = True
+        subjects = ", ".join(f"{r.subject} ({r.test_type})" for r in clashing)
+        print(f"{Colors.FAIL}{date.strftime('%Y-%m-%d')} en {room}: {subjects}{Colors.END}")
+    if not found:
+        print(f"{Colors.GREEN}No hay choques de sala.{Colors.END}")
+    print(f"\n{Colors.HEADER}Días con más de {DEFAULT_MAX_PER_DAY} pruebas{Colors.END}")
+    found = False
+    for date, overloaded in day_overloads(entries, DEFAULT_MAX_PER_DAY, presorted=True):
+        found = True
+        subjects = ", ".join(r.subject for r in overloaded)
+        print(f"{Colors.WARNING}{date.strftime('%Y-%m-%d')}: {len(overloaded)} pruebas ({subjects}){Colors.END}")
+    if not found:
+        print(f"{Colors.GREEN}No hay días sobrecargados.{Colors.END}")
 
 
 # Función para revisar los recordatorios y enviar notificaciones
 def notify_reminders():
     today = datetime.date.today()
-    for reminder in reminders:
-        date = datetime.datetime.strptime(reminder["date"], "%Y-%m-%d").date()
-        days_left = (date - today).days
-
-        if days_left == 7:  # Notificación con 7 días de anticipación
-            show_notification(f"Recordatorio: {reminder['subject']}", f"Tienes un examen tipo {reminder['test_type']} en la sala {reminder['room']} en 7 días.")
-            print(f"{Colors.BLUE}Recordatorio: La prueba '{reminder['subject']}' es en 7 días.{Colors.END}")
-        elif days_left == 1:  # Notificación un día antes
-            show_notification(f"Recordatorio: {reminder['subject']}", f"Tienes un examen tipo {reminder['test_type']} en la sala {reminder['room']} MAÑANA.")
-            print(f"{Colors.BLUE}Recordatorio: La prueba '{reminder.subject}' es MAÑANA.{Colors.END}")
-        elif days_left == 0:
-            show_notification(f"Recordatorio: {reminder.subject}", f"Tienes un examen tipo {reminder.test_type} en la sala {reminder.room} HOY.")
-            print(f"Recordatorio: La prueba '{reminder.subject}' es HOY.")
+    count = 0
+    for days_left, exam_date, reminder in reminder_index.due_in([7, 1, 0], today):
+        title, message = notification_text(reminder.subject, reminder.test_type, reminder.room, days_left)
+        exam_key = f"{shard.user}|{reminder.subject}|{reminder.test_type}|{reminder.room}|{exam_date.strftime('%Y-%m-%d')}"
+        if dispatcher.submit(Notification(exam_key, days_left, today, title, message)):
+            print(f"{Colors.BLUE}{title}. {message}{Colors.END}")
+            count += 1
+    return count
 
 
 
@@ -456,14 +536,32 @@ def delete_reminder():
     print(f"{Colors.WARNING}¿Está seguro que desea eliminar este recordatorio? (si/no){Colors.END}")
     confirm = input().lower()    
     if confirm == 'si' or confirm == "y":
-        del reminders[reminder_number]
+        shard.delete(reminder_number)
         print(f"{Colors.GREEN}Recordatorio eliminado con éxito.{Colors.END}")
     elif confirm == 'no' or confirm == "n":
         print(f"{Colors.WARNING}Operación cancelada.{Colors.END}")
 
-def main():
-    notify_reminders()
-    show_tutorial()
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recordatorios de pruebas universitarias.")
+    parser.add_argument("--tutorial", action="store_true", help="muestra el tutorial aunque ya se haya completado")
+    parser.add_argument("--profile-startup", action="store_true", help="muestra los tiempos de importación y sale")
+    parser.add_argument("--metrics-file", help="al salir, escribe las métricas en formato Prometheus en este archivo")
+    parser.add_argument("--user", default=None, help="usuario cuyos recordatorios se usan (por defecto, el del sistema)")
+    args = parser.parse_args(argv)
+    if args.profile_startup:
+        profile_startup()
+        return
+
+    global dispatcher
+    dispatcher = NotificationDispatcher(PlyerBackend(), SentLedger())
+    activate_user(args.user or default_user())
+    dispatcher.start()
+    track_job("notify_reminders", notify_reminders)
+    state = load_state()
+    if args.tutorial or not state.get("tutorial_completed"):
+        show_tutorial()
+        state["tutorial_completed"] = True
+        save_state(state)
     while True:
         print(f"\n{Colors.HEADER}Menú Principal{Colors.END}")
         print(f"{Colors.BLUE}1. Agregar un nuevo recordatorio{Colors.END}")
@@ -476,7 +574,9 @@ def main():
         print(f"{Colors.BLUE}8. Buscar recordatorios{Colors.END}")
         print(f"{Colors.BLUE}9. Eliminar un recordatorio{Colors.END}")
         print(f"{Colors.BLUE}10. Editar un recordatorio{Colors.END}")
-        print(f"{Colors.BLUE}11. Salir{Colors.END}")
+        print(f"{Colors.BLUE}11. Ver choques de salas y días sobrecargados{Colors.END}")
+        print(f"{Colors.BLUE}12. Cambiar de usuario ({shard.user}){Colors.END}")
+        print(f"{Colors.BLUE}13. Salir{Colors.END}")
         try:
             choice = int(input("Seleccione una opción: "))
             if choice == 1:
@@ -489,14 +589,14 @@ def main():
                     try:
                         exam_number = int(input("Ingrese el numero del examen que desea marcar como completado: "))-1
                         if 0 <= exam_number < len(reminders):
-                            reminders[exam_number]["completed"] = True
+                            shard.complete(exam_number)
                             break
                     except ValueError:
                         print(f"{Colors.FAIL}Opcion invalida, ingrese un numero valido.{Colors.END}")
             elif choice == 4:
                 save_reminders_to_file()
             elif choice == 5:
-                load_reminders_from_file()
+                load_reminders_from_file(input("Ingrese el nombre del archivo para cargar los recordatorios (ej: backup.json): "))
             elif choice == 6:
                 export_reminders_to_text()
             elif choice == 7:
@@ -508,6 +608,18 @@ def main():
             elif choice == 10:
                 edit_reminder()
             elif choice == 11:
+                show_conflicts()
+            elif choice == 12:
+                user = input("Ingrese el nombre de usuario: ").strip()
+                if user and activate_user(user):
+                    print(f"{Colors.GREEN}Usuario activo: {user} ({len(reminders)} recordatorios).{Colors.END}")
+                    track_job("notify_reminders", notify_reminders)
+            elif choice == 13:
+                shards.close()
+                dispatcher.stop()
+                if args.metrics_file:
+                    with open(args.metrics_file, "w") as f:
+                        f.write(REGISTRY.render())
                 break
         except ValueError:
             print(f"{Colors.FAIL}Opción inválida. Por favor, ingrese un número.{Colors.END}")
@@ -0,0 +1,47 @@
+# -*- mode: python ; coding: utf-8 -*-
+# Perfil de arranque rápido: carpeta en vez de un solo archivo, así el ejecutable
+# no se descomprime en un directorio temporal en cada inicio. Sin UPX para no
+# descomprimir las bibliotecas al cargarlas. Uso: pyinstaller app_onedir.spec
+
+
+a = Analysis(
+    ['app.py'],
+    pathex=[],
+    binaries=[],
+    datas=[('templates', 'templates'), ('static', 'static')],
+    hiddenimports=['web'],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=[],
+    noarchive=False,
+    optimize=0,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='app',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=True,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+)
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='app',
+)
@@ -0,0 +1,281 @@
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import secrets
+import statistics
+import sys
+import tempfile
+import time
+
+import app as cli
+from dispatch import MemoryBackend, NotificationDispatcher, SentLedger
+from ics_export import iter_ics, reminder_events
+from reminder_record import Reminder
+from reminder_store import ReminderIndex
+from search_index import SearchIndex
+from snapshot import open_snapshot, write_snapshot
+from user_shards import ShardStore
+
+# Benchmarks reproducibles de las operaciones más usadas. Uso:
+#   python benchmark.py --sizes 1000 10000 --output resultados.json --baseline benchmark_baseline.json
+# Las pruebas web (Flask + SQLite) se omiten si Flask no está instalado.
+
+SUBJECTS = [
+    "Cálculo I", "Cálculo II", "Álgebra Lineal", "Física General", "Química General", "Programación",
+    "Estructuras de Datos", "Estadística", "Economía", "Ecuaciones Diferenciales", "Bases de Datos",
+    "Sistemas Operativos", "Redes", "Termodinámica", "Mecánica", "Biología Celular", "Historia",
+    "Inglés Técnico", "Ética Profesional", "Investigación de Operaciones",
+]
+TEST_TYPES = ["Examen", "Control", "Certamen", "Quiz", "Laboratorio"]
+TEST_TYPE_WEIGHTS = [30, 35, 20, 10, 5]
+PRIORITIES = ["alta", "media", "baja"]
+PRIORITY_WEIGHTS = [20, 30, 50]
+ROOMS = [f"{building}-{floor}{number:02d}" for building in "ABCDE" for floor in range(1, 5) for number in range(1, 11)]
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_WEB_LIMIT = 100000
+DEFAULT_THRESHOLD = 0.20
+
+
+def generate_reminders(count, seed=42, start=None):
+    # Materias con distribución tipo Zipf y fechas concentradas en los periodos
+    # de pruebas (mitad y final de cada semestre).
+    rng = random.Random(seed)
+    start = start or datetime.date.today()
+    subject_weights = [1 / (rank + 1) for rank in range(len(SUBJECTS))]
+    peaks = [start + datetime.timedelta(days=offset) for offset in (45, 110, 225, 290)]
+    reminders = []
+    for _ in range(count):
+        if rng.random() < 0.7:
+            date = rng.choice(peaks) + datetime.timedelta(days=round(rng.gauss(0, 6)))
+        else:
+            date = start + datetime.timedelta(days=rng.randrange(-30, 365))
+        reminder = {
+            "subject": rng.choices(SUBJECTS, subject_weights)[0],
+            "test_type": rng.choices(TEST_TYPES, TEST_TYPE_WEIGHTS)[0],
+            "room": rng.choice(ROOMS),
+            "date": date.strftime("%Y-%m-%d"),
+            "priority": rng.choices(PRIORITIES, PRIORITY_WEIGHTS)[0],
+        }
+        if rng.random() < 0.05:
+            reminder["frequency"] = rng.choice([7, 14])
+        reminders.append(reminder)
+    return reminders
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - began)
+    return {"median_s": statistics.median(timings), "min_s": min(timings), "repeat": repeat}
+
+
+def bench_core(data, repeat, workdir):
+    results = {}
+    reminders = [Reminder.from_dict(item) for item in data]
+    today = datetime.date.today()
+    reminder_index = ReminderIndex(reminders)
+    search_index = SearchIndex(reminders)
+
+    # Cada repetición agrega todo a un shard nuevo, con su diario en disco,
+    # igual que la opción de agregar del CLI.
+    def add_all():
+        store = ShardStore(tempfile.mkdtemp(dir=workdir))
+        shard = store.get("benchmark")
+        for reminder in reminders:
+            shard.append(reminder)
+        store.close()
+
+    results["add"] = measure(add_all, repeat)
+    results["search_subject"] = measure(lambda: search_index.search(subject="calculo"), repeat)
+    results["search_combined"] = measure(lambda: search_index.search(subject="es", test_type="exa", room="b-"), repeat)
+    results["search_date"] = measure(lambda: reminder_index.on(today + datetime.timedelta(days=45)), repeat)
+    results["upcoming_30_days"] = measure(lambda: list(reminder_index.upcoming(30, today)), repeat)
+
+    # notify_reminders del CLI sobre un usuario con todos los recordatorios; el
+    # despachador no arranca sus hilos, así que nada se envía.
+    cli.shards = ShardStore(os.path.join(workdir, "usuarios"))
+    cli.activate_user("benchmark")
+    cli.shard.reset(reminders)
+
+    def notify_sweep():
+        cli.dispatcher = NotificationDispatcher(MemoryBackend(), SentLedger(":memory:"), maxsize=0)
+        with contextlib.redirect_stdout(io.StringIO()):
+            cli.notify_reminders()
+
+    try:
+        results["notify_reminders"] = measure(notify_sweep, repeat)
+    finally:
+        cli.dispatcher = None
+        cli.shards.close()
+
+    json_path = os.path.join(workdir, "backup.json")
+    snapshot_path = os.path.join(workdir, "backup.rsnap")
+
+    def save_json():
+        with open(json_path, "w") as f:
+            json.dump([reminder.to_dict() for reminder in reminders], f, indent=4, default=str)
+
+    def load_json():
+        with open(json_path) as f:
+            [Reminder.from_dict(item) for item in json.load(f)]
+
+    def load_snapshot():
+        with open_snapshot(snapshot_path) as snapshot:
+            list(snapshot.records())
+
+    results["save_json"] = measure(save_json, repeat)
+    results["load_json"] = measure(load_json, repeat)
+    results["save_snapshot"] = measure(lambda: write_snapshot(snapshot_path, reminders), repeat)
+    results["load_snapshot"] = measure(load_snapshot, repeat)
+
+    def export_ics():
+        for _ in iter_ics(reminder_events(reminders, reminder_index)):
+            pass
+
+    results["export_ics"] = measure(export_ics, repeat)
+    return results
+
+
+def bench_web(reminders, repeat, db_dir):
+    # web.py se importa una sola vez, así que la base temporal dura toda la corrida
+    # y se vacía antes de cargar cada tamaño. La base y el programador se fijan
+    # siempre: los valores del entorno podrían apuntar a una base real.
+    database_uri = "sqlite:///" + os.path.join(db_dir, "exams.db")
+    os.environ["EXAMS_DATABASE_URI"] = database_uri
+    os.environ["EXAMS_SCHEDULER"] = "0"
+    os.environ.setdefault("SECRET_KEY", secrets.token_hex(16))
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            import web
+    except ImportError as e:
+        return {"skipped": f"dependencias web no disponibles: {e}"}
+    if web.app.config["SQLALCHEMY_DATABASE_URI"] != database_uri:
+        return {"skipped": "web.py ya estaba importado con otra base de datos"}
+    from sqlalchemy import delete, insert
+
+    import scheduler
+    from database import Exam, db
+
+    results = {}
+    today = datetime.date.today()
+    rows = [{"name": r["subject"], "test_type": r["test_type"], "room": r["room"],
+             "date": datetime.date.fromisoformat(r["date"]), "completed": False} for r in reminders]
+    client = web.app.test_client()
+    with web.app.app_context():
+        db.session.execute(delete(Exam))
+        db.session.execute(insert(Exam), rows)
+        db.session.commit()
+
+        def check_reminders():
+            with contextlib.redirect_stdout(io.StringIO()):
+                scheduler.check_reminders()
+
+        results["check_reminders"] = measure(check_reminders, repeat)
+
+    # "listing" vacía la caché de consultas en cada repetición para medir la
+    # consulta y el render; "listing_cached" mide los aciertos de la caché.
+    def uncached_listing():
+        web.query_cache.clear()
+        client.get("/")
+
+    results["listing"] = measure(uncached_listing, repeat)
+    results["listing_cached"] = measure(lambda: client.get("/"), repeat)
+    etag = client.get("/").headers.get("ETag")
+    results["listing_304"] = measure(lambda: client.get("/", headers={"If-None-Match": etag}), repeat)
+    form = {"subject": "Cálculo I", "test_type": "Examen", "room": "A-101", "date": today.isoformat()}
+    results["add_route"] = measure(lambda: client.post("/add_reminder", data=form), repeat)
+    return results
+
+
+def run(sizes, repeat, seed, web_limit):
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory() as db_dir:
+        for size in sizes:
+            reminders = generate_reminders(size, seed)
+            with tempfile.TemporaryDirectory() as workdir:
+                results = bench_core(reminders, repeat, workdir)
+            if size <= web_limit:
+                results["web"] = bench_web(reminders, repeat, db_dir)
+            report["results"][str(size)] = results
+    return report
+
+
+def compare(report, baseline, threshold):
+    # Devuelve las operaciones cuya mediana empeoró más que el umbral.
+    thresholds = baseline.get("thresholds", {})
+    regressions = []
+    for size, operations in report["results"].items():
+        base_operations = baseline.get("results", {}).get(size, {})
+        for name, current, base in _pairs(operations, base_operations):
+            if not base.get("median_s"):
+                continue
+            ratio = current["median_s"] / base["median_s"]
+            if ratio > 1 + thresholds.get(name, threshold):
+                regressions.append({"size": int(size), "operation": name, "ratio": round(ratio, 3),
+                                    "median_s": current["median_s"], "baseline_s": base["median_s"]})
+    return regressions
+
+
+def _pairs(operations, base_operations, prefix=""):
+    for name, current in operations.items():
+        base = base_operations.get(name)
+        if not isinstance(current, dict) or not isinstance(base, dict):
+            continue
+        if "median_s" in current:
+            yield prefix + name, current, base
+        else:
+            yield from _pairs(current, base, prefix + name + ".")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de los recordatorios de exámenes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--web-limit", type=int, default=DEFAULT_WEB_LIMIT,
+                        help="tamaño máximo para el que se corren las pruebas web")
+    parser.add_argument("--output", help="archivo JSON de resultados (por defecto, salida estándar)")
+    parser.add_argument("--baseline", help="resultados de referencia para detectar regresiones")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="empeoramiento relativo permitido (0.2 = 20%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="guarda los resultados como referencia")
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.repeat, args.seed, args.web_limit)
+    regressions = []
+    if args.baseline and os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        report["regressions"] = regressions
+
+    output = json.dumps(report, indent=4)
+    if args.save_baseline and args.baseline:
+        with open(args.baseline, "w") as f:
+            f.write(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
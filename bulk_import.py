@@ -0,0 +1,81 @@
+import csv
+import json
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import Exam, db, parse_exam_fields, run_write
+
+DEFAULT_BATCH_SIZE = 500
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.errors = []  # (línea, mensaje)
+
+    def to_dict(self):
+        return {
+            "imported": self.imported,
+            "errors": [{"line": line, "error": message} for line, message in self.errors],
+        }
+
+
+def detect_format(filename):
+    for extension, fmt in FORMATS.items():
+        if filename.lower().endswith(extension):
+            return fmt
+    raise ValueError("Formato no soportado. Usa un archivo .csv o .jsonl")
+
+
+def iter_rows(stream, fmt):
+    # Lee el archivo de a una fila; nunca se carga completo en memoria.
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_no, line in enumerate(stream, start=1):
+            if line.strip():
+                yield line_no, line
+
+
+def parse_row(row, owner=""):
+    if isinstance(row, str):
+        row = json.loads(row)
+        if not isinstance(row, dict):
+            raise ValueError("La línea no es un objeto JSON.")
+    return Exam(**parse_exam_fields(row), owner=owner)
+
+
+def import_exams(stream, fmt, batch_size=DEFAULT_BATCH_SIZE, owner=""):
+    report = ImportReport()
+    batch = []
+    for line_no, row in iter_rows(stream, fmt):
+        try:
+            batch.append((line_no, parse_row(row, owner)))
+        except ValueError as e:
+            report.errors.append((line_no, str(e)))
+        if len(batch) >= batch_size:
+            _commit_batch(batch, report)
+            batch = []
+    if batch:
+        _commit_batch(batch, report)
+    return report
+
+
+def _commit_batch(batch, report):
+    # run_write reintenta si la base está bloqueada y deja la sesión limpia si falla.
+    try:
+        run_write(lambda: db.session.add_all(exam for _, exam in batch))
+        report.imported += len(batch)
+        return
+    except SQLAlchemyError:
+        pass
+    # Si el lote falla se reintenta fila por fila para aislar las filas con error.
+    for line_no, exam in batch:
+        try:
+            run_write(lambda: db.session.add(exam))
+            report.imported += 1
+        except SQLAlchemyError as e:
+            report.errors.append((line_no, str(getattr(e, "orig", None) or e)))
@@ -0,0 +1,67 @@
+import itertools
+
+# Detección de choques de sala y de días sobrecargados.
+# - RoomDateIndex: tabla hash (sala, fecha) -> recordatorios, para avisar al
+#   agregar o editar en O(1).
+# - room_clashes / day_overloads: reporte completo ordenando una vez y
+#   recorriendo los grupos consecutivos, O(n log n) en vez de comparar pares.
+
+DEFAULT_MAX_PER_DAY = 2
+
+
+def room_key(room):
+    # "A-101", "a-101 " y "A-101" son la misma sala.
+    return " ".join((room or "").split()).casefold()
+
+
+class RoomDateIndex:
+    def __init__(self, reminders=()):
+        self.rebuild(reminders)
+
+    def rebuild(self, reminders):
+        self._slots = {}
+        for reminder in reminders:
+            self.add(reminder)
+
+    def add(self, reminder):
+        self._slots.setdefault((room_key(reminder.room), reminder.ordinal), []).append(reminder)
+
+    def remove(self, reminder):
+        key = (room_key(reminder.room), reminder.ordinal)
+        slot = self._slots.get(key, [])
+        for i, item in enumerate(slot):
+            if item is reminder:
+                del slot[i]
+                if not slot:
+                    del self._slots[key]
+                return True
+        return False
+
+    def clashes(self, room, ordinal, exclude=None):
+        # Los recurrentes se indexan por su primera fecha; sus ocurrencias
+        # posteriores se revisan en el reporte completo.
+        return [r for r in self._slots.get((room_key(room), ordinal), ()) if r is not exclude and not r.completed]
+
+
+def _groups(entries, key, minimum):
+    for group_key, group in itertools.groupby(entries, key):
+        group = list(group)
+        if len(group) >= minimum:
+            yield group_key, group
+
+
+def room_clashes(entries, presorted=False, key=room_key):
+    # entries: tuplas (fecha, sala, item). Devuelve (sala, fecha, [items]) con
+    # más de un item en la misma sala y día.
+    if not presorted:
+        entries = sorted(entries, key=lambda e: (key(e[1]), e[0]))
+    for (_, date), group in _groups(entries, lambda e: (key(e[1]), e[0]), 2):
+        yield group[0][1], date, [item for _, _, item in group]
+
+
+def day_overloads(entries, max_per_day=DEFAULT_MAX_PER_DAY, presorted=False):
+    # Días con más de max_per_day pruebas.
+    if not presorted:
+        entries = sorted(entries, key=lambda e: e[0])
+    for date, group in _groups(entries, lambda e: e[0], max_per_day + 1):
+        yield date, [item for _, _, item in group]
@@ -0,0 +1,374 @@
+import datetime
+import os
+import sqlite3
+import threading
+import time
+
+from flask import current_app, request
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect, text, tuple_
+from sqlalchemy.exc import OperationalError
+
+from conflicts import room_key
+
+DATABASE_URI = "sqlite:///exams.db"
+# Usuarios por lote en los barridos del programador.
+OWNER_BATCH_SIZE = 200
+# Cabecera con el usuario autenticado, fijada por el proxy de autenticación.
+# Solo se lee con EXAMS_TRUST_USER_HEADER activo: sin proxy la enviaría el cliente.
+OWNER_HEADER = "X-Exams-User"
+
+# Configuración de SQLite; cada clave se puede cambiar en app.config antes de init_db.
+# WAL permite que las lecturas (rutas web, programador) no bloqueen a las escrituras.
+SQLITE_DEFAULTS = {
+    "SQLITE_BUSY_TIMEOUT_MS": 5000,
+    "SQLITE_POOL_SIZE": 8,
+    "SQLITE_MAX_OVERFLOW": 8,
+    "SQLITE_STATEMENT_CACHE": 256,
+    "SQLITE_WRITE_RETRIES": 5,
+    "SQLITE_WRITE_BACKOFF": 0.05,
+    "SQLITE_PRAGMAS": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16000,  # En KiB cuando es negativo.
+        "mmap_size": 128 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+}
+
+db = SQLAlchemy()
+
+
+class Exam(db.Model):
+    __table_args__ = (
+        db.Index("ix_exam_date", "date"),
+        db.Index("ix_exam_completed_date", "completed", "date"),
+        db.Index("ix_exam_name", "name"),
+        db.Index("ix_exam_room_key_date", "room_key", "date"),
+        # Consultas por usuario: el dueño va primero para que cada una lea solo sus filas.
+        db.Index("ix_exam_owner_date", "owner", "date"),
+        db.Index("ix_exam_owner_completed_date", "owner", "completed", "date"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    test_type = db.Column(db.String(50))
+    room = db.Column(db.String(50))
+    # Sala normalizada como en el CLI (conflicts.room_key), para que "A-101" y
+    # "a-101 " choquen también en la web. El default cubre los INSERT de Core.
+    room_key = db.Column(db.String(50), default=lambda context: room_key(context.get_current_parameters().get("room")))
+    date = db.Column(db.Date, nullable=False)
+    completed = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    owner = db.Column(db.String(100), nullable=False, default="", server_default="")
+
+    @db.validates("room")
+    def _set_room_key(self, key, room):
+        self.room_key = room_key(room)
+        return room
+
+
+# Contador de cambios de la tabla exam, mantenido por triggers de SQLite para que
+# cualquier escritura (formulario, importación masiva, SQL directo) lo incremente.
+class ExamVersion(db.Model):
+    __tablename__ = "exam_version"
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Lease del programador: la fila la tiene un solo proceso a la vez y la renueva
+# periódicamente; si deja de renovarla (el proceso murió) otro la toma al vencer.
+class SchedulerLease(db.Model):
+    __tablename__ = "scheduler_lease"
+
+    name = db.Column(db.String(50), primary_key=True)
+    owner = db.Column(db.String(100), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+
+class JobRun(db.Model):
+    __tablename__ = "job_run"
+    __table_args__ = (db.Index("ix_job_run_job_started", "job", "started_at"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    job = db.Column(db.String(50), nullable=False)
+    owner = db.Column(db.String(100), nullable=False)
+    started_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime)
+    status = db.Column(db.String(20), nullable=False, default="running")
+
+
+# Registro de cambios para la sincronización por API: cada escritura en exam
+# incrementa la versión y anota qué examen cambió con esa versión.
+class ExamChange(db.Model):
+    __tablename__ = "exam_change"
+    __table_args__ = (db.Index("ix_exam_change_owner_version", "owner", "version"),)
+
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    exam_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(10), nullable=False)
+    owner = db.Column(db.String(100), nullable=False, default="", server_default="")
+
+
+_CHANGE_TRIGGERS = {
+    "exam_change_insert": ("AFTER INSERT ON exam", "insert", "NEW"),
+    "exam_change_update": ("AFTER UPDATE ON exam", "update", "NEW"),
+    "exam_change_delete": ("AFTER DELETE ON exam", "delete", "OLD"),
+}
+# Triggers de versiones anteriores, reemplazados por los de _CHANGE_TRIGGERS.
+_OLD_TRIGGERS = ("exam_version_insert", "exam_version_update", "exam_version_delete")
+# Índices de versiones anteriores.
+_OLD_INDEXES = ("ix_exam_room_date",)
+
+
+# Columnas que no existían en las primeras versiones de cada tabla.
+_ADDED_COLUMNS = {
+    "exam": {
+        "test_type": "VARCHAR(50)",
+        "room": "VARCHAR(50)",
+        "completed": "BOOLEAN NOT NULL DEFAULT 0",
+        "owner": "VARCHAR(100) NOT NULL DEFAULT ''",
+        "room_key": "VARCHAR(50)",
+    },
+    "exam_change": {
+        "owner": "VARCHAR(100) NOT NULL DEFAULT ''",
+    },
+}
+
+
+def ensure_schema():
+    db.create_all()
+    inspector = inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table, columns in _ADDED_COLUMNS.items():
+            existing = {column["name"] for column in inspector.get_columns(table)}
+            for name, ddl in columns.items():
+                if name not in existing:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+        for name in _OLD_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        for model in (Exam, ExamChange):
+            for index in model.__table__.indexes:
+                index.create(conn, checkfirst=True)
+        conn.execute(text("INSERT OR IGNORE INTO exam_version (id, version) VALUES (1, 0)"))
+        # Los triggers se recrean siempre para que una base existente tome la
+        # definición actual.
+        for name in _OLD_TRIGGERS + tuple(_CHANGE_TRIGGERS):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        # Sin triggers, para que completar room_key no cuente como cambio.
+        missing = conn.execute(text("SELECT id, room FROM exam WHERE room_key IS NULL")).fetchall()
+        if missing:
+            conn.execute(text("UPDATE exam SET room_key = :key WHERE id = :id"),
+                         [{"key": room_key(room), "id": exam_id} for exam_id, room in missing])
+        for name, (when, op, row) in _CHANGE_TRIGGERS.items():
+            conn.execute(text(
+                f"CREATE TRIGGER {name} {when} BEGIN "
+                "UPDATE exam_version SET version = version + 1 WHERE id = 1; "
+                "INSERT INTO exam_change (version, exam_id, op, owner) "
+                f"VALUES ((SELECT version FROM exam_version WHERE id = 1), {row}.id, '{op}', {row}.owner); END"
+            ))
+
+
+# Validación compartida por el formulario web y la importación masiva.
+def parse_exam_fields(data):
+    subject = data.get("subject")
+    test_type = data.get("test_type")
+    room = data.get("room")
+    date_str = data.get("date")
+    if not all([subject, test_type, room, date_str]):
+        raise ValueError("Por favor, completa todos los campos.")
+    try:
+        date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        raise ValueError("Formato de fecha incorrecto. Usa AAAA-MM-DD")
+    return {"name": subject, "test_type": test_type, "room": room, "date": date}
+
+
+def init_db(app):
+    app.config.setdefault("SQLALCHEMY_DATABASE_URI", os.environ.get("EXAMS_DATABASE_URI", DATABASE_URI))
+    for key, value in SQLITE_DEFAULTS.items():
+        app.config.setdefault(key, value)
+    is_sqlite = app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite")
+    if is_sqlite:
+        app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {
+            "pool_size": app.config["SQLITE_POOL_SIZE"],
+            "max_overflow": app.config["SQLITE_MAX_OVERFLOW"],
+            "query_cache_size": app.config["SQLITE_STATEMENT_CACHE"],
+            "connect_args": {
+                "timeout": app.config["SQLITE_BUSY_TIMEOUT_MS"] / 1000,
+                "check_same_thread": False,
+                "cached_statements": app.config["SQLITE_STATEMENT_CACHE"],
+            },
+        })
+    db.init_app(app)
+    with app.app_context():
+        if is_sqlite:
+            pragmas = dict(app.config["SQLITE_PRAGMAS"], busy_timeout=app.config["SQLITE_BUSY_TIMEOUT_MS"])
+            event.listen(db.engine, "connect", _pragma_setter(pragmas))
+        ensure_schema()
+    app.extensions["exam_writes"] = (app.config["SQLITE_WRITE_RETRIES"], app.config["SQLITE_WRITE_BACKOFF"])
+
+
+def _pragma_setter(pragmas):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+    return set_pragmas
+
+
+# Las escrituras de este proceso pasan de a una por este lock; las lecturas usan
+# el pool en paralelo. Si otro proceso tiene la base bloqueada se reintenta.
+_write_lock = threading.Lock()
+
+
+def is_lock_error(error):
+    message = str(getattr(error, "orig", error)).lower()
+    return isinstance(getattr(error, "orig", None), sqlite3.OperationalError) and (
+        "locked" in message or "busy" in message)
+
+
+def run_write(work, retries=None, backoff=None):
+    # work() agrega o modifica objetos en db.session; se vuelve a ejecutar en
+    # cada intento porque el rollback descarta lo que hizo el intento anterior.
+    default_retries, default_backoff = current_app.extensions.get("exam_writes", (0, 0))
+    retries = default_retries if retries is None else retries
+    backoff = default_backoff if backoff is None else backoff
+    for attempt in range(retries + 1):
+        with _write_lock:
+            try:
+                result = work()
+                db.session.commit()
+                return result
+            except Exception as e:
+                db.session.rollback()
+                if not (isinstance(e, OperationalError) and is_lock_error(e)) or attempt == retries:
+                    raise
+        time.sleep(backoff * 2 ** attempt)
+
+
+# Consultas: todas filtran en SQL para aprovechar los índices de la tabla.
+# owner puede ser un usuario, una lista de usuarios o None (todos).
+def owned_by(query, owner):
+    if owner is None:
+        return query
+    if isinstance(owner, (list, tuple, set)):
+        return query.filter(Exam.owner.in_(owner))
+    return query.filter(Exam.owner == owner)
+
+
+def current_owner():
+    # "" es el usuario por defecto, dueño de los exámenes creados antes de
+    # separar por usuario; sin proxy de autenticación todos usan ese.
+    if current_app.config.get("EXAMS_TRUST_USER_HEADER"):
+        return request.headers.get(OWNER_HEADER, "")
+    return ""
+
+
+def pending_exams(owner=None):
+    return owned_by(Exam.query, owner).filter(Exam.completed == False).order_by(Exam.date, Exam.id)
+
+
+def completed_exams(owner=None):
+    return owned_by(Exam.query, owner).filter(Exam.completed == True).order_by(Exam.date, Exam.id)
+
+
+def exams_between(start, end=None, completed=False, owner=None):
+    query = owned_by(Exam.query, owner).filter(Exam.completed == completed, Exam.date >= start)
+    if end is not None:
+        query = query.filter(Exam.date <= end)
+    return query.order_by(Exam.date, Exam.id)
+
+
+def exams_filtered(start=None, end=None, subject=None, owner=None):
+    query = owned_by(Exam.query, owner)
+    if start is not None:
+        query = query.filter(Exam.date >= start)
+    if end is not None:
+        query = query.filter(Exam.date <= end)
+    if subject:
+        query = exams_by_subject_prefix(subject, query)
+    return query.order_by(Exam.date, Exam.id)
+
+
+def exams_due(today, offsets, completed=False, owner=None):
+    dates = [today + datetime.timedelta(days=offset) for offset in offsets]
+    query = owned_by(Exam.query, owner).filter(Exam.completed == completed, Exam.date.in_(dates))
+    return query.order_by(Exam.date, Exam.id)
+
+
+def owner_batches(batch_size=OWNER_BATCH_SIZE):
+    # Recorre los usuarios con exámenes en lotes, por orden de nombre; cada lote
+    # es una búsqueda por ix_exam_owner_date.
+    after = None
+    while True:
+        query = db.session.query(Exam.owner).distinct()
+        if after is not None:
+            query = query.filter(Exam.owner > after)
+        batch = [owner for owner, in query.order_by(Exam.owner).limit(batch_size)]
+        if not batch:
+            return
+        yield batch
+        after = batch[-1]
+
+
+def exams_by_subject_prefix(prefix, query=None):
+    # Comparación por rango en vez de LIKE para que SQLite use ix_exam_name.
+    query = query if query is not None else Exam.query
+    return query.filter(Exam.name >= prefix, Exam.name < prefix + "\uffff")
+
+
+def exams_in_room(room, date, completed=False):
+    return Exam.query.filter(Exam.room_key == room_key(room), Exam.date == date, Exam.completed == completed)
+
+
+def exams_by_room_date(start, end=None):
+    # Orden (sala normalizada, fecha) para el barrido de choques; lo resuelve SQLite al consultar.
+    query = Exam.query.filter(Exam.completed == False, Exam.date >= start)
+    if end is not None:
+        query = query.filter(Exam.date <= end)
+    return query.order_by(Exam.room_key, Exam.date, Exam.id)
+
+
+def exam_version():
+    return db.session.execute(text("SELECT version FROM exam_version WHERE id = 1")).scalar() or 0
+
+
+def exam_changes(since, limit, owner=None):
+    query = ExamChange.query.filter(ExamChange.version > since)
+    if owner is not None:
+        query = query.filter(ExamChange.owner == owner)
+    return query.order_by(ExamChange.version).limit(limit).all()
+
+
+def oldest_change_version():
+    return db.session.query(db.func.min(ExamChange.version)).scalar()
+
+
+def prune_exam_changes(keep):
+    # Conserva las últimas `keep` versiones; los clientes más atrasados deben
+    # volver a descargar todo.
+    cutoff = exam_version() - keep
+    if cutoff <= 0:
+        return 0
+    return run_write(lambda: ExamChange.query.filter(ExamChange.version <= cutoff).delete())
+
+
+# Paginación por clave (date, id): cada página es una búsqueda por índice,
+# sin OFFSET, así el costo no crece con el número de página.
+def encode_cursor(exam):
+    return f"{exam.date.isoformat()}_{exam.id}"
+
+
+def decode_cursor(cursor):
+    date_str, _, exam_id = cursor.partition("_")
+    return datetime.date.fromisoformat(date_str), int(exam_id)
+
+
+def exams_page(query, after=None, limit=50):
+    if after is not None:
+        query = query.filter(tuple_(Exam.date, Exam.id) > after)
+    exams = query.order_by(None).order_by(Exam.date, Exam.id).limit(limit + 1).all()
+    next_cursor = encode_cursor(exams[limit - 1]) if len(exams) > limit else None
+    return exams[:limit], next_cursor
@@ -0,0 +1,212 @@
+import collections
+import datetime
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from metrics import NOTIFICATION_LATENCY
+
+# En el home del usuario, como el estado del CLI: junto a __file__ no sirve en el
+# ejecutable de un solo archivo, que se descomprime en un directorio temporal.
+LEDGER_PATH = os.environ.get("EXAMS_LEDGER_PATH",
+                             os.path.join(os.path.expanduser("~"), ".recordatorios_notificaciones.db"))
+
+# date es el día en que corresponde enviar el aviso; (exam_key, offset, date)
+# identifica el aviso en el registro de enviados.
+Notification = collections.namedtuple("Notification", "exam_key offset date title message")
+
+
+def notification_text(subject, test_type, room, days_left):
+    if days_left == 0:
+        when = "HOY"
+    elif days_left == 1:
+        when = "MAÑANA"
+    else:
+        when = f"en {days_left} días"
+    return f"Recordatorio: {subject}", f"Tienes un examen tipo {test_type} en la sala {room} {when}."
+
+
+# Backends de envío: cualquier objeto con send(title, message).
+class PlyerBackend:
+    def send(self, title, message):
+        from plyer import notification
+
+        notification.notify(
+            title=title,
+            message=message,
+            app_icon=None,  # Puedes especificar un icono si lo tienes
+            timeout=10  # Duración de la notificación en segundos
+        )
+
+
+class ConsoleBackend:
+    def send(self, title, message):
+        print(f"{title}\n{message}")
+
+
+class MemoryBackend:
+    # Guarda los avisos en memoria; pensado para pruebas locales.
+    def __init__(self):
+        self.sent = []
+
+    def send(self, title, message):
+        self.sent.append((title, message))
+
+
+class SentLedger:
+    # Registro persistente de avisos enviados, para no repetirlos tras reiniciar.
+
+    def __init__(self, path=LEDGER_PATH):
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sent ("
+                "exam_key TEXT NOT NULL, offset INTEGER NOT NULL, date TEXT NOT NULL, sent_at TEXT NOT NULL, "
+                "PRIMARY KEY (exam_key, offset, date))"
+            )
+
+    def was_sent(self, notification):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM sent WHERE exam_key = ? AND offset = ? AND date = ?",
+                (notification.exam_key, notification.offset, notification.date.isoformat()),
+            ).fetchone()
+        return row is not None
+
+    def mark_sent(self, notifications):
+        now = datetime.datetime.now().isoformat(timespec="seconds")
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO sent (exam_key, offset, date, sent_at) VALUES (?, ?, ?, ?)",
+                [(n.exam_key, n.offset, n.date.isoformat(), now) for n in notifications],
+            )
+
+    def close(self):
+        self._conn.close()
+
+
+class RateLimiter:
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second if per_second else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class NotificationDispatcher:
+    # Cola acotada con un grupo de workers que envían los avisos fuera del hilo
+    # que los genera. Los avisos del mismo día que llegan juntos se agrupan.
+
+    def __init__(self, backend, ledger, workers=2, maxsize=1000, per_second=2.0,
+                 retries=3, backoff=1.0, coalesce_window=0.2):
+        self.backend = backend
+        self.ledger = ledger
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.coalesce_window = coalesce_window
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._limiter = RateLimiter(per_second)
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"notificaciones-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        # Termina de enviar lo que quedó en la cola y detiene los workers.
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def join(self):
+        self._queue.join()
+
+    def submit(self, notification):
+        key = (notification.exam_key, notification.offset, notification.date)
+        with self._pending_lock:
+            if key in self._pending or self.ledger.was_sent(notification):
+                return False
+            try:
+                self._queue.put_nowait(notification)
+            except queue.Full:
+                print(f"Cola de notificaciones llena, se descarta: {notification.title}")
+                return False
+            self._pending.add(key)
+        return True
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.coalesce_window
+            while True:
+                try:
+                    extra = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if extra is None:
+                    stop = True
+                    break
+                batch.append(extra)
+            groups = collections.defaultdict(list)
+            for notification in batch:
+                groups[notification.date].append(notification)
+            for group in groups.values():
+                self._deliver(group)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                self._queue.task_done()
+                return
+
+    def _deliver(self, group):
+        if len(group) == 1:
+            title, message = group[0].title, group[0].message
+        else:
+            title = f"Tienes {len(group)} recordatorios de exámenes"
+            message = "\n".join(f"{n.title}. {n.message}" for n in group)
+        try:
+            for attempt in range(self.retries + 1):
+                self._limiter.wait()
+                began = time.perf_counter()
+                try:
+                    self.backend.send(title, message)
+                except Exception as e:
+                    NOTIFICATION_LATENCY.observe(time.perf_counter() - began, "error")
+                    if attempt == self.retries:
+                        print(f"Error al enviar la notificación '{title}': {e}")
+                        return
+                    time.sleep(self.backoff * 2 ** attempt)
+                else:
+                    NOTIFICATION_LATENCY.observe(time.perf_counter() - began, "ok")
+                    self.ledger.mark_sent(group)
+                    return
+        finally:
+            with self._pending_lock:
+                for n in group:
+                    self._pending.discard((n.exam_key, n.offset, n.date))
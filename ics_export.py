@@ -0,0 +1,93 @@
+import datetime
+import uuid
+
+from recurrence import occurrences
+
+ICS_EXTENSION = ".ics"
+PRODID = "-//Reminder_test//Recordatorios de Pruebas//ES"
+_UID_NAMESPACE = uuid.UUID("6f1c9a52-4d7e-4a8e-9a51-3c2b0f7d8e10")
+
+
+def escape(text):
+    return (str(text).replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\n", "\\n"))
+
+
+def fold(line):
+    # RFC 5545: líneas de hasta 75 octetos, las siguientes empiezan con un espacio.
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1  # No cortar un carácter UTF-8 por la mitad.
+        parts.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+        limit = 74
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def vevent(uid, subject, test_type, room, date, stamp, frequency=None):
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART;VALUE=DATE:{date.strftime('%Y%m%d')}",
+        f"DTEND;VALUE=DATE:{(date + datetime.timedelta(days=1)).strftime('%Y%m%d')}",
+        f"SUMMARY:{escape(subject)} ({escape(test_type)})",
+    ]
+    if room:
+        lines.append(f"LOCATION:{escape(room)}")
+    if frequency:
+        lines.append(f"RRULE:FREQ=DAILY;INTERVAL={int(frequency)}")
+    lines.append("END:VEVENT")
+    return "".join(fold(line) for line in lines)
+
+
+def iter_ics(events):
+    # Genera el calendario por partes: cabecera, un VEVENT por evento y cierre.
+    # events: iterable de (uid, materia, tipo, sala, fecha, frecuencia).
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    yield fold("BEGIN:VCALENDAR") + fold("VERSION:2.0") + fold(f"PRODID:{PRODID}") + fold("CALSCALE:GREGORIAN")
+    for uid, subject, test_type, room, date, frequency in events:
+        yield vevent(uid, subject, test_type, room, date, stamp, frequency)
+    yield fold("END:VCALENDAR")
+
+
+def reminder_uid(reminder, date=None):
+    key = "|".join((reminder.subject, reminder.test_type, reminder.room, reminder.date_str))
+    if date is not None:
+        key += f"|{date.isoformat()}"
+    return f"{uuid.uuid5(_UID_NAMESPACE, key)}@reminder-test"
+
+
+def reminder_events(reminders, reminder_index, start=None, end=None, allowed=None):
+    # Sin fin de rango, cada recurrente es un solo evento con RRULE (con DTSTART
+    # en su primera ocurrencia desde start): expandirlo hasta date.max no
+    # termina nunca. Con fin, se exportan las ocurrencias del índice.
+    # allowed filtra por id del recordatorio.
+    if end is None:
+        for reminder in reminders:
+            if allowed is not None and id(reminder) not in allowed:
+                continue
+            date = reminder.date
+            if start is not None:
+                date = next(occurrences(date, reminder.frequency or 0, start, datetime.date.max), None)
+                if date is None:
+                    continue
+            yield (reminder_uid(reminder), reminder.subject, reminder.test_type, reminder.room,
+                   date, reminder.frequency)
+        return
+    for date, reminder in reminder_index.between(start or datetime.date.min, end):
+        if allowed is None or id(reminder) in allowed:
+            yield (reminder_uid(reminder, date), reminder.subject, reminder.test_type, reminder.room,
+                   date, None)
+
+
+def exam_events(query, batch_size=500):
+    # Lee la tabla por lotes con un cursor del servidor en vez de cargarla completa.
+    for exam in query.yield_per(batch_size):
+        yield f"exam-{exam.id}@reminder-test", exam.name, exam.test_type or "", exam.room, exam.date, None
@@ -0,0 +1,202 @@
+import json
+import os
+import re
+import threading
+
+from reminder_record import Reminder
+from snapshot import SNAPSHOT_EXTENSION, fsync_directory, open_snapshot, write_snapshot
+
+# Autoguardado del CLI: cada cambio se agrega como una línea JSON a un diario
+# (O(cambio)) y cada tanto el diario se compacta en un snapshot nuevo.
+#
+# Archivos en el directorio del usuario:
+#   snapshot-<seq>.rsnap  estado con todos los cambios hasta seq inclusive.
+#   journal-<seq>.log     cambios desde seq en adelante, uno por línea.
+# Al cargar se toma el snapshot de mayor seq y se aplican solo los cambios
+# posteriores, así un corte en medio de una compactación no duplica ni pierde nada.
+
+FSYNC_INTERVAL = 1.0  # Segundos máximos entre que se escribe un cambio y su fsync.
+COMPACT_BYTES = 1024 * 1024
+
+_SNAPSHOT_NAME = re.compile(r"^snapshot-(\d+)" + re.escape(SNAPSHOT_EXTENSION) + "$")
+_JOURNAL_NAME = re.compile(r"^journal-(\d+)\.log$")
+
+
+class JournalError(ValueError):
+    pass
+
+
+def _numbered(directory, pattern):
+    found = []
+    for name in os.listdir(directory):
+        match = pattern.match(name)
+        if match:
+            found.append((int(match.group(1)), os.path.join(directory, name)))
+    return sorted(found)
+
+
+def apply_entry(reminders, entry):
+    op = entry["op"]
+    if op == "add":
+        reminders.append(Reminder.from_dict(entry["reminder"]))
+    elif op == "edit":
+        reminders[entry["index"]] = Reminder.from_dict(entry["reminder"])
+    elif op == "delete":
+        del reminders[entry["index"]]
+    elif op == "complete":
+        reminders[entry["index"]].completed = True
+    else:
+        raise JournalError(f"Operación desconocida en el diario: {op!r}")
+
+
+def read_entries(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Línea cortada por un cierre abrupto: lo que sigue no se escribió.
+                return
+            yield entry
+
+
+class Journal:
+    def __init__(self, directory, legacy_snapshot=None, fsync_interval=FSYNC_INTERVAL,
+                 compact_bytes=COMPACT_BYTES):
+        self.directory = directory
+        self.legacy_snapshot = legacy_snapshot
+        self.fsync_interval = fsync_interval
+        self.compact_bytes = compact_bytes
+        self.seq = 0
+        self.size = 0
+        self._file = None
+        self._lock = threading.Lock()
+        self._timer = None
+        self._compaction = None
+
+    def load(self):
+        # Devuelve los recordatorios del último snapshot con el diario aplicado y
+        # deja abierto un diario nuevo para los cambios siguientes.
+        os.makedirs(self.directory, exist_ok=True)
+        # Un .tmp es un snapshot que no llegó a renombrarse: su diario sigue ahí.
+        for name in os.listdir(self.directory):
+            if name.endswith(SNAPSHOT_EXTENSION + ".tmp"):
+                os.remove(os.path.join(self.directory, name))
+        snapshots = _numbered(self.directory, _SNAPSHOT_NAME)
+        reminders = []
+        base = 0
+        if snapshots:
+            base, path = snapshots[-1]
+        elif self.legacy_snapshot and os.path.exists(self.legacy_snapshot):
+            path = self.legacy_snapshot
+        else:
+            path = None
+        if path:
+            # Los cambios del diario se aplican sobre una lista: se decodifica completo.
+            with open_snapshot(path) as snapshot:
+                reminders = list(snapshot.records())
+        self.seq = base
+        pending = 0
+        for _, journal_path in _numbered(self.directory, _JOURNAL_NAME):
+            pending += os.path.getsize(journal_path)
+            for entry in read_entries(journal_path):
+                if entry["seq"] <= self.seq:
+                    continue
+                try:
+                    apply_entry(reminders, entry)
+                except (IndexError, KeyError, ValueError) as e:
+                    raise JournalError(f"Diario dañado en {journal_path} (cambio {entry['seq']}): {e}")
+                self.seq = entry["seq"]
+        self._open()
+        # Lo que quedó de sesiones anteriores cuenta para decidir la compactación.
+        self.size = pending
+        return reminders
+
+    def _open(self):
+        # Si ya existe un diario con este número solo puede tener una línea
+        # cortada (si tuviera cambios válidos, seq sería mayor): se descarta.
+        path = os.path.join(self.directory, f"journal-{self.seq + 1:012d}.log")
+        self._file = open(path, "w", encoding="utf-8")
+        fsync_directory(self.directory)
+        self.size = 0
+
+    def record(self, op, index=None, reminder=None):
+        # Escribe el cambio en el archivo (sobrevive a un cierre del proceso) y
+        # programa el fsync. Devuelve True cuando conviene compactar.
+        entry = {"seq": self.seq + 1, "op": op}
+        if index is not None:
+            entry["index"] = index
+        if reminder is not None:
+            entry["reminder"] = reminder.to_dict()
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self.seq += 1
+            self.size += len(line)
+            if self._timer is None and self.fsync_interval is not None:
+                self._timer = threading.Timer(self.fsync_interval, self.sync)
+                self._timer.daemon = True
+                self._timer.start()
+        return self.size >= self.compact_bytes and not self.compacting
+
+    def sync(self):
+        with self._lock:
+            self._timer = None
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+
+    @property
+    def compacting(self):
+        return self._compaction is not None and self._compaction.is_alive()
+
+    def compact(self, reminders, reset=False):
+        # reminders debe reflejar todos los cambios registrados hasta ahora; se
+        # copia la lista (los registros no se modifican en el lugar) y el snapshot
+        # se escribe en segundo plano mientras los cambios nuevos van a otro diario.
+        # reset=True registra un reemplazo completo (p. ej. al cargar un respaldo).
+        if self._compaction is not None:
+            self._compaction.join()
+        with self._lock:
+            if reset:
+                self.seq += 1
+            upto = self.seq
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._open()
+            records = list(reminders)
+        if reset:
+            # El reemplazo solo existe en el snapshot: se escribe antes de volver.
+            self._write_snapshot(records, upto)
+            return
+        self._compaction = threading.Thread(target=self._write_snapshot, args=(records, upto),
+                                            name="compactacion", daemon=True)
+        self._compaction.start()
+
+    def _write_snapshot(self, records, upto):
+        # write_snapshot vuelve con el snapshot ya en disco (fsync del archivo y
+        # del directorio); recién entonces se puede borrar lo que reemplaza.
+        write_snapshot(os.path.join(self.directory, f"snapshot-{upto:012d}{SNAPSHOT_EXTENSION}"), records)
+        for seq, path in _numbered(self.directory, _SNAPSHOT_NAME):
+            if seq < upto:
+                os.remove(path)
+        for start, path in _numbered(self.directory, _JOURNAL_NAME):
+            if start <= upto:
+                os.remove(path)
+        if self.legacy_snapshot and os.path.exists(self.legacy_snapshot):
+            os.remove(self.legacy_snapshot)
+
+    def close(self):
+        if self._compaction is not None:
+            self._compaction.join()
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
@@ -0,0 +1,67 @@
+import contextlib
+import datetime
+import os
+import socket
+import uuid
+
+from sqlalchemy import or_, select
+from sqlalchemy.dialects.sqlite import insert
+
+from database import JobRun, SchedulerLease, db, run_write
+
+LEASE_NAME = "scheduler"
+LEASE_TTL = 30  # Segundos sin renovar tras los que otro proceso puede tomar el lease.
+
+
+def utcnow():
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+class LeaderLease:
+    # Elección de líder con una fila de SQLite: cada proceso intenta tomar o
+    # renovar el lease con un solo upsert condicional, que solo gana si el lease
+    # es suyo o ya venció.
+
+    def __init__(self, name=LEASE_NAME, ttl=LEASE_TTL, owner=None):
+        self.name = name
+        self.ttl = ttl
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.held = False
+
+    def try_acquire(self):
+        now = utcnow()
+        stmt = insert(SchedulerLease).values(
+            name=self.name, owner=self.owner, expires_at=now + datetime.timedelta(seconds=self.ttl))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["name"],
+            set_={"owner": stmt.excluded.owner, "expires_at": stmt.excluded.expires_at},
+            where=or_(SchedulerLease.owner == self.owner, SchedulerLease.expires_at < now),
+        )
+        run_write(lambda: db.session.execute(stmt))
+        owner = db.session.scalar(select(SchedulerLease.owner).where(SchedulerLease.name == self.name))
+        self.held = owner == self.owner
+        return self.held
+
+    def release(self):
+        if not self.held:
+            return
+        run_write(lambda: db.session.execute(
+            SchedulerLease.__table__.delete().where(
+                SchedulerLease.name == self.name, SchedulerLease.owner == self.owner)))
+        self.held = False
+
+
+@contextlib.contextmanager
+def record_job_run(job, owner):
+    # Registra inicio, fin y resultado de cada ejecución en la tabla job_run.
+    run = JobRun(job=job, owner=owner, started_at=utcnow(), status="running")
+    run_write(lambda: db.session.add(run))
+    status = "error"
+    try:
+        yield run
+        status = "ok"
+    finally:
+        def finish():
+            run.finished_at = utcnow()
+            run.status = status
+        run_write(finish)
@@ -0,0 +1,210 @@
+import threading
+import time
+
+# Métricas en memoria con salida en el formato de texto de Prometheus. Solo usa
+# la biblioteca estándar para que el CLI pueda importarlo sin costo.
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def set(self, value, *labels):
+        # Para contadores que se llevan en otro lado (p. ej. la caché de consultas).
+        with self._lock:
+            self._values[labels] = value
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.labels, labels)} {_number(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            counts = entry[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, *labels):
+        entry = self._values.get(labels)
+        return entry[2] if entry else 0
+
+    def samples(self):
+        with self._lock:
+            items = sorted((labels, (list(entry[0]), entry[1], entry[2])) for labels, entry in self._values.items())
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                yield f"{self.name}_bucket{_labels(self.labels, labels, [('le', _number(bound))])} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self.register(Gauge(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def add_collector(self, collect):
+        # collect() se llama antes de cada render para actualizar gauges externos.
+        self._collectors.append(collect)
+
+    def render(self):
+        for collect in self._collectors:
+            collect()
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    "exams_http_request_duration_seconds", "Latencia de las peticiones HTTP por ruta.", ("method", "route", "status"))
+SQL_STATEMENTS = REGISTRY.counter(
+    "exams_sql_statements_total", "Sentencias SQL ejecutadas por tipo.", ("operation",))
+SQL_LATENCY = REGISTRY.histogram(
+    "exams_sql_statement_duration_seconds", "Duración de las sentencias SQL por tipo.", ("operation",))
+JOB_LATENCY = REGISTRY.histogram(
+    "exams_job_duration_seconds", "Duración de las tareas de recordatorios.", ("job", "status"),
+    buckets=DEFAULT_BUCKETS + (30.0, 60.0))
+JOB_ITEMS = REGISTRY.counter(
+    "exams_job_items_total", "Elementos procesados por las tareas de recordatorios.", ("job",))
+NOTIFICATION_LATENCY = REGISTRY.histogram(
+    "exams_notification_send_duration_seconds", "Latencia de envío de notificaciones por resultado.", ("outcome",))
+
+
+def track_job(job, func):
+    # Si la tarea devuelve un entero se cuenta como número de elementos procesados.
+    began = time.perf_counter()
+    status = "error"
+    try:
+        result = func()
+        status = "ok"
+    finally:
+        JOB_LATENCY.observe(time.perf_counter() - began, job, status)
+    if isinstance(result, int):
+        JOB_ITEMS.inc(result, job)
+    return result
+
+
+def sql_operation(statement):
+    word = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return word if word in ("SELECT", "INSERT", "UPDATE", "DELETE", "PRAGMA", "BEGIN", "COMMIT") else "OTHER"
+
+
+def instrument_engine(engine):
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("metrics_started")
+        if not started:
+            return
+        operation = sql_operation(statement)
+        SQL_STATEMENTS.inc(1, operation)
+        SQL_LATENCY.observe(time.perf_counter() - started.pop(), operation)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        started = context.connection.info.get("metrics_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+
+def instrument_app(app, slow_ms=None):
+    # Latencia por ruta (la regla, no la URL, para no crear una serie por id) y
+    # aviso en consola de las peticiones que superan slow_ms.
+    from flask import g, request
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        started = g.pop("metrics_started", None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule else "sin_ruta"
+        REQUEST_LATENCY.observe(elapsed, request.method, route, str(response.status_code))
+        if slow_ms is not None and elapsed * 1000 >= slow_ms:
+            print(f"Petición lenta: {request.method} {request.full_path.rstrip('?')} tardó {elapsed * 1000:.1f} ms")
+        return response
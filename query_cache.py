@@ -0,0 +1,55 @@
+import collections
+import threading
+
+DEFAULT_MAXSIZE = 256
+
+# Fila de examen desacoplada de la sesión de SQLAlchemy, para poder guardarla
+# entre peticiones.
+ExamRow = collections.namedtuple("ExamRow", "id name test_type room date completed")
+
+
+def exam_rows(exams):
+    return [ExamRow(e.id, e.name, e.test_type, e.room, e.date, e.completed) for e in exams]
+
+
+class QueryCache:
+    # Caché LRU acotada. Las claves incluyen el contador de cambios de la tabla,
+    # así una escritura deja obsoletas las entradas viejas sin borrarlas: dejan
+    # de pedirse y el LRU las descarta.
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        # Se calcula fuera del lock; si dos peticiones calculan lo mismo, gana la última.
+        value = compute()
+        if self.maxsize > 0:
+            with self._lock:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits,
+                    "misses": self.misses, "hit_ratio": round(self.hits / total, 4) if total else 0.0}
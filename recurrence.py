@@ -0,0 +1,32 @@
+import datetime
+import heapq
+
+
+def occurrences(first, frequency, start, end):
+    # Fechas first + k * frequency dentro de [start, end], generadas a demanda:
+    # se salta directo a la primera del rango sin recorrer la serie.
+    if frequency <= 0:
+        if start <= first <= end:
+            yield first
+        return
+    # Se avanza sobre ordinales: con end cerca de date.max, sumar un timedelta
+    # a la última fecha se saldría del rango de date.
+    skip = max(0, -(-(start - first).days // frequency))
+    day = first.toordinal() + skip * frequency
+    last = end.toordinal()
+    while day <= last:
+        yield datetime.date.fromordinal(day)
+        day += frequency
+
+
+def rule_stream(first, frequency, reminder, start, end):
+    for day in occurrences(first, frequency, start, end):
+        yield day, reminder
+
+
+def merge_occurrences(one_offs, rules, start, end):
+    # one_offs: pares (fecha, recordatorio) ya ordenados por fecha.
+    # rules: tuplas (primera fecha, frecuencia, recordatorio).
+    streams = [one_offs] + [rule_stream(first, frequency, reminder, start, end)
+                            for first, frequency, reminder in rules]
+    return heapq.merge(*streams, key=lambda item: item[0])
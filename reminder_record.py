@@ -0,0 +1,90 @@
+import datetime
+import enum
+import sys
+
+DATE_FORMAT = "%Y-%m-%d"
+
+
+class Priority(enum.IntEnum):
+    ALTA = 0
+    MEDIA = 1
+    BAJA = 2
+
+    @classmethod
+    def parse(cls, value):
+        # Igual que en add_reminder: cualquier valor desconocido queda como "baja".
+        try:
+            return cls[str(value).upper()]
+        except KeyError:
+            return cls.BAJA
+
+    def __str__(self):
+        return self.name.lower()
+
+
+class Status(enum.IntEnum):
+    PENDIENTE = 0
+    COMPLETADO = 1
+
+
+class Reminder:
+    # Recordatorio compacto: fecha como ordinal (int), textos internados para que
+    # las materias, tipos y salas repetidas compartan el mismo objeto.
+    __slots__ = ("ordinal", "subject", "test_type", "room", "priority", "status", "frequency")
+
+    def __init__(self, subject, test_type, room, ordinal, priority=Priority.BAJA,
+                 status=Status.PENDIENTE, frequency=None):
+        self.subject = sys.intern(str(subject))
+        self.test_type = sys.intern(str(test_type))
+        self.room = sys.intern(str(room))
+        self.ordinal = ordinal
+        self.priority = priority
+        self.status = status
+        self.frequency = frequency
+
+    @property
+    def date(self):
+        return datetime.date.fromordinal(self.ordinal)
+
+    @property
+    def date_str(self):
+        return self.date.strftime(DATE_FORMAT)
+
+    @property
+    def completed(self):
+        return self.status == Status.COMPLETADO
+
+    @completed.setter
+    def completed(self, value):
+        self.status = Status.COMPLETADO if value else Status.PENDIENTE
+
+    def __repr__(self):
+        return f"Reminder({self.subject!r}, {self.test_type!r}, {self.room!r}, {self.date_str!r})"
+
+    # Conversión al formato de diccionario de los respaldos JSON.
+    @classmethod
+    def from_dict(cls, data):
+        frequency = data.get("frequency")
+        return cls(
+            data.get("subject", ""),
+            data.get("test_type", ""),
+            data.get("room", ""),
+            datetime.datetime.strptime(data["date"], DATE_FORMAT).date().toordinal(),
+            Priority.parse(data.get("priority")),
+            Status.COMPLETADO if data.get("completed") else Status.PENDIENTE,
+            int(frequency) if frequency else None,
+        )
+
+    def to_dict(self):
+        data = {
+            "subject": self.subject,
+            "test_type": self.test_type,
+            "room": self.room,
+            "date": self.date_str,
+            "priority": str(self.priority),
+        }
+        if self.frequency:
+            data["frequency"] = self.frequency
+        if self.completed:
+            data["completed"] = True
+        return data
@@ -0,0 +1,95 @@
+import bisect
+import datetime
+
+from recurrence import merge_occurrences
+
+
+class _SortedByDate:
+    # Lista de recordatorios ordenada por (fecha, id) con búsqueda binaria.
+
+    def __init__(self):
+        self.keys = []
+        self.items = []
+
+    def rebuild(self, reminders):
+        entries = sorted(((r.ordinal, id(r)), r) for r in reminders)
+        self.keys = [key for key, _ in entries]
+        self.items = [r for _, r in entries]
+
+    def add(self, reminder):
+        key = (reminder.ordinal, id(reminder))
+        pos = bisect.bisect_left(self.keys, key)
+        self.keys.insert(pos, key)
+        self.items.insert(pos, reminder)
+
+    def remove(self, reminder):
+        key = (reminder.ordinal, id(reminder))
+        pos = bisect.bisect_left(self.keys, key)
+        if pos < len(self.keys) and self.keys[pos] == key:
+            del self.keys[pos]
+            del self.items[pos]
+            return True
+        return False
+
+    def position(self, ordinal):
+        return bisect.bisect_left(self.keys, (ordinal,))
+
+
+def is_recurring(reminder):
+    return bool(reminder.frequency)
+
+
+class ReminderIndex:
+    # Índice de recordatorios ordenado por fecha (ordinal) para consultas por rango.
+    # Los recurrentes se guardan como reglas y sus ocurrencias se generan solo
+    # para el rango pedido.
+
+    def __init__(self, reminders=()):
+        self._once = _SortedByDate()
+        self._rules = _SortedByDate()
+        self.rebuild(reminders)
+
+    def __len__(self):
+        return len(self._once.items) + len(self._rules.items)
+
+    def rebuild(self, reminders):
+        reminders = list(reminders)
+        self._once.rebuild(r for r in reminders if not is_recurring(r))
+        self._rules.rebuild(r for r in reminders if is_recurring(r))
+
+    def add(self, reminder):
+        (self._rules if is_recurring(reminder) else self._once).add(reminder)
+
+    def remove(self, reminder):
+        return (self._rules if is_recurring(reminder) else self._once).remove(reminder)
+
+    def _one_offs(self, start, end):
+        lo = self._once.position(start.toordinal())
+        hi = self._once.position(end.toordinal() + 1)
+        for i in range(lo, hi):
+            yield datetime.date.fromordinal(self._once.keys[i][0]), self._once.items[i]
+
+    def between(self, start, end):
+        # Devuelve pares (fecha, recordatorio) con start <= fecha <= end, en orden.
+        # Solo las reglas que empiezan antes del fin del rango pueden aportar fechas.
+        last = self._rules.position(end.toordinal() + 1)
+        rules = [(datetime.date.fromordinal(key[0]), reminder.frequency, reminder)
+                 for key, reminder in zip(self._rules.keys[:last], self._rules.items[:last])]
+        if not rules:
+            return self._one_offs(start, end)
+        return merge_occurrences(self._one_offs(start, end), rules, start, end)
+
+    def on(self, date):
+        return [reminder for _, reminder in self.between(date, date)]
+
+    def upcoming(self, days, today=None):
+        today = today or datetime.date.today()
+        return self.between(today, today + datetime.timedelta(days=days))
+
+    def due_in(self, offsets, today=None):
+        # Recordatorios que faltan exactamente N días, para cada N en offsets.
+        today = today or datetime.date.today()
+        for offset in offsets:
+            day = today + datetime.timedelta(days=offset)
+            for _, reminder in self.between(day, day):
+                yield offset, day, reminder
@@ -1,18 +1,366 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from flask import Flask
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session, object_session
+import atexit
 import datetime
-from database import Exam
+import heapq
+import threading
+import time
+from database import (Exam, exam_changes, exam_version, exams_between, exams_due, init_db, oldest_change_version,
+                      owner_batches, prune_exam_changes)
+from dispatch import Notification, NotificationDispatcher, PlyerBackend, SentLedger, notification_text
+from leader import LeaderLease, record_job_run
+from metrics import track_job
+
+# Días de anticipación de cada aviso y hora a la que se envían.
+NOTIFY_OFFSETS = (7, 1, 0)
+NOTIFY_TIME = datetime.time(9, 0)
+# Versiones que se conservan en el registro de cambios de la API.
+CHANGE_LOG_KEEP = 100000
+# Con más cambios ajenos que estos desde la última carga se recarga la cola entera.
+RELOAD_THRESHOLD = 5000
+REFRESH_BATCH_SIZE = 500
 
 scheduler = BackgroundScheduler()
+dispatcher = NotificationDispatcher(PlyerBackend(), SentLedger())
+
+
+def print_reminder(name, exam_date, days_left):
+    print(f"Recordatorio: La prueba '{name}' es en {days_left} días.")
+
+
+def send_reminder(exam_id, name, test_type, room, exam_date, days_left):
+    # Se encola el aviso; el envío ocurre en los workers del dispatcher.
+    title, message = notification_text(name, test_type, room, days_left)
+    dispatcher.submit(Notification(f"exam:{exam_id}", days_left, datetime.date.today(), title, message))
+
+
+class NotificationSchedule:
+    # Cola de prioridad con el próximo aviso de cada examen. Solo hay un job de
+    # APScheduler, programado para el aviso más cercano. La cola solo está activa
+    # en el proceso líder; en los demás los cambios se ignoran.
+
+    def __init__(self, scheduler, notify=send_reminder, job_id="notificaciones"):
+        self.scheduler = scheduler
+        self.notify = notify
+        self.job_id = job_id
+        self.job = self.fire_due
+        self.active = False
+        self.loaded_version = None
+        self._heap = []
+        self._exams = {}
+        self._versions = {}
+        # Versiones de exam_version escritas por este proceso: los eventos del
+        # mapper ya las aplicaron, el latido no las vuelve a leer.
+        self._local_versions = set()
+        # Mientras fire_due corre no se reprograma el job (APScheduler saltaría
+        # la nueva ejecución); fire_due vacía lo vencido y rearma al terminar.
+        self._firing = False
+        self._lock = threading.Lock()
+
+    def fire_times(self, exam_date, now=None):
+        now = now or datetime.datetime.now()
+        for offset in NOTIFY_OFFSETS:
+            day = exam_date - datetime.timedelta(days=offset)
+            if day < now.date():
+                continue
+            # Si el aviso de hoy ya pasó su hora, se envía de inmediato.
+            yield max(datetime.datetime.combine(day, NOTIFY_TIME), now), offset
+
+    def load(self, exams, version=None):
+        with self._lock:
+            self._heap = []
+            self._exams = {}
+            for exam in exams:
+                self._push(exam.id, (exam.name, exam.test_type, exam.room), exam.date)
+            heapq.heapify(self._heap)
+            self.active = True
+            self._advance(version)
+            self._rearm()
+
+    def clear(self):
+        with self._lock:
+            self._heap = []
+            self._exams = {}
+            self._local_versions = set()
+            self.active = False
+            self.loaded_version = None
+            self._rearm()
+
+    def mark_local(self, versions):
+        with self._lock:
+            if self.active:
+                self._local_versions.update(versions)
+
+    def local_versions(self):
+        with self._lock:
+            return set(self._local_versions)
+
+    def only_local_since(self, version):
+        # True si todos los cambios entre la última carga y version son de este proceso.
+        with self._lock:
+            return all(v in self._local_versions for v in range(self.loaded_version + 1, version + 1))
+
+    def apply_changes(self, saved, removed, version=None):
+        # Actualiza solo los exámenes indicados y rearma el job una vez.
+        # saved: tuplas (id, (materia, tipo, sala), fecha).
+        with self._lock:
+            if not self.active:
+                return
+            for exam_id, details, exam_date in saved:
+                self._push(exam_id, details, exam_date, heap_push=True)
+            for exam_id in removed:
+                # Las entradas viejas quedan en el heap y se descartan al salir.
+                self._versions[exam_id] = self._versions.get(exam_id, 0) + 1
+                self._exams.pop(exam_id, None)
+            if version is not None:
+                self._advance(version)
+            self._rearm()
+
+    def _advance(self, version):
+        self.loaded_version = version
+        if version is not None:
+            self._local_versions = {v for v in self._local_versions if v > version}
+
+    def _push(self, exam_id, details, exam_date, heap_push=False):
+        version = self._versions.get(exam_id, 0) + 1
+        self._versions[exam_id] = version
+        self._exams[exam_id] = (details, exam_date)
+        for fire_at, offset in self.fire_times(exam_date):
+            entry = (fire_at, exam_id, offset, version)
+            if heap_push:
+                heapq.heappush(self._heap, entry)
+            else:
+                self._heap.append(entry)
+
+    def _discard_stale(self):
+        while self._heap and self._heap[0][3] != self._versions.get(self._heap[0][1]):
+            heapq.heappop(self._heap)
+
+    def _rearm(self):
+        if self._firing:
+            return
+        self._discard_stale()
+        if not self._heap:
+            if self.scheduler.get_job(self.job_id):
+                self.scheduler.remove_job(self.job_id)
+            return
+        # max_instances=2 cubre un aviso que vence justo cuando fire_due está
+        # terminando; fire_due toma el lock, así que dos ejecuciones no se pisan.
+        self.scheduler.add_job(func=self.job, trigger="date", run_date=self._heap[0][0],
+                               id=self.job_id, replace_existing=True, misfire_grace_time=None, max_instances=2)
+
+    def _pop_due(self, now):
+        due = []
+        self._discard_stale()
+        while self._heap and self._heap[0][0] <= now:
+            _, exam_id, offset, _ = heapq.heappop(self._heap)
+            details, exam_date = self._exams[exam_id]
+            due.append((exam_id, details, exam_date, offset))
+            self._discard_stale()
+        return due
+
+    def fire_due(self):
+        # Envía hasta que no quede nada vencido, incluidos los avisos que se
+        # agregaron mientras se enviaban los anteriores.
+        count = 0
+        with self._lock:
+            self._firing = True
+        try:
+            while True:
+                with self._lock:
+                    due = self._pop_due(datetime.datetime.now())
+                if not due:
+                    return count
+                for exam_id, details, exam_date, days_left in due:
+                    self.notify(exam_id, *details, exam_date, days_left)
+                    count += 1
+        finally:
+            with self._lock:
+                self._firing = False
+                self._rearm()
+
+
+notifications = NotificationSchedule(scheduler)
+
 
 def check_reminders():
     today = datetime.date.today()
-    exams = Exam.query.all()
-    for exam in exams:
-        days_left = (exam.date - today).days
-        if days_left in [7, 1, 0]:
-            print(f"Recordatorio: La prueba '{exam.name}' es en {days_left} días.")
-
-app = Flask(__name__)
-scheduler.add_job(func=check_reminders, trigger="interval", hours=24)  # Revisión diaria.
-scheduler.start()
\ No newline at end of file
+    count = 0
+    for owners in owner_batches():
+        for exam in exams_due(today, NOTIFY_OFFSETS, owner=owners):
+            print_reminder(exam.name, exam.date, (exam.date - today).days)
+            count += 1
+    return count
+
+
+def pending_by_owner(today):
+    # Exámenes pendientes de todos los usuarios, leídos de a un lote de usuarios.
+    for owners in owner_batches():
+        yield from exams_between(today, owner=owners)
+
+
+# Mantiene la cola al día cuando se agrega, edita o elimina un examen. Los
+# eventos del mapper ocurren en el flush: los cambios se guardan en la sesión
+# (con los valores de ese momento) y se aplican a la cola recién en el commit;
+# si la transacción se revierte, se descartan.
+def _pending_exams(target):
+    session = object_session(target)
+    return session.info.setdefault("exam_pending", {}) if session is not None else None
+
+
+@event.listens_for(Exam, "after_insert")
+@event.listens_for(Exam, "after_update")
+def exam_saved(mapper, connection, target):
+    pending = _pending_exams(target)
+    if pending is not None:
+        pending[target.id] = None if target.completed else ((target.name, target.test_type, target.room), target.date)
+
+
+@event.listens_for(Exam, "after_delete")
+def exam_deleted(mapper, connection, target):
+    pending = _pending_exams(target)
+    if pending is not None:
+        pending[target.id] = None
+
+
+# Versiones escritas por cada flush de este proceso. SQLite tiene un solo
+# escritor, así que entre la versión antes y después del flush no hay cambios
+# de otros procesos. Se confirman recién al hacer commit.
+_VERSION_SQL = text("SELECT version FROM exam_version WHERE id = 1")
+
+
+@event.listens_for(Session, "before_flush")
+def remember_version(session, flush_context, instances):
+    if notifications.active and any(isinstance(obj, Exam)
+                                    for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["exam_version_before"] = session.connection().execute(_VERSION_SQL).scalar() or 0
+
+
+@event.listens_for(Session, "after_flush")
+def note_local_versions(session, flush_context):
+    before = session.info.pop("exam_version_before", None)
+    if before is not None:
+        after = session.connection().execute(_VERSION_SQL).scalar() or 0
+        session.info.setdefault("exam_versions", []).append((before, after))
+
+
+@event.listens_for(Session, "after_commit")
+def commit_local_versions(session):
+    pending = session.info.pop("exam_pending", None)
+    if pending:
+        notifications.apply_changes(
+            [(exam_id, *entry) for exam_id, entry in pending.items() if entry is not None],
+            [exam_id for exam_id, entry in pending.items() if entry is None])
+    for before, after in session.info.pop("exam_versions", ()):
+        notifications.mark_local(range(before + 1, after + 1))
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_local_versions(session):
+    session.info.pop("exam_pending", None)
+    session.info.pop("exam_versions", None)
+    session.info.pop("exam_version_before", None)
+
+
+def refresh_changed(version):
+    # Vuelve a leer solo los exámenes que otros procesos cambiaron desde la
+    # última carga. Devuelve False si hace falta recargar todo (registro de
+    # cambios podado o demasiados cambios).
+    since = notifications.loaded_version
+    oldest = oldest_change_version()
+    if oldest is None or oldest > since + 1:
+        return False
+    changes = exam_changes(since, RELOAD_THRESHOLD + 1)
+    if len(changes) > RELOAD_THRESHOLD:
+        return False
+    local = notifications.local_versions()
+    ids = sorted({change.exam_id for change in changes if change.version not in local})
+    saved, removed = [], set(ids)
+    for i in range(0, len(ids), REFRESH_BATCH_SIZE):
+        for exam in Exam.query.filter(Exam.id.in_(ids[i:i + REFRESH_BATCH_SIZE])):
+            if not exam.completed:
+                saved.append((exam.id, (exam.name, exam.test_type, exam.room), exam.date))
+                removed.discard(exam.id)
+    notifications.apply_changes(saved, removed, version)
+    return True
+
+
+# Con varios workers (gunicorn) cada proceso llama a start_scheduler, pero solo
+# el que tiene el lease arma los avisos. El latido renueva el lease, toma el
+# relevo si el líder murió y aplica a la cola los exámenes que cambiaron otros procesos.
+lease = LeaderLease()
+
+
+def run_job(app, job, func):
+    with app.app_context():
+        if not lease.held:
+            return None
+        with record_job_run(job, lease.owner):
+            return track_job(job, func)
+
+
+def heartbeat(app):
+    with app.app_context():
+        try:
+            leader = lease.try_acquire()
+        except Exception as e:
+            print(f"No se pudo renovar el lease del programador: {e}")
+            leader = lease.held = False
+        if not leader:
+            if notifications.active:
+                notifications.clear()
+            return
+        version = exam_version()
+        # Los cambios de este proceso llegan a la cola en el commit, así que
+        # una versión propia ya está aplicada y una revertida nunca la tocó.
+        if notifications.active:
+            if version == notifications.loaded_version:
+                return
+            if notifications.only_local_since(version):
+                notifications.apply_changes((), (), version)
+                return
+            if refresh_changed(version):
+                return
+        notifications.load(pending_by_owner(datetime.date.today()), version)
+
+
+def start_scheduler(app):
+    if scheduler.running:
+        return
+    notifications.job = lambda: run_job(app, "notificaciones", notifications.fire_due)
+    dispatcher.start()
+    scheduler.start()
+    heartbeat(app)
+    scheduler.add_job(func=heartbeat, args=(app,), trigger="interval", seconds=max(1, lease.ttl // 3),
+                      id="latido", replace_existing=True, coalesce=True, max_instances=1)
+    scheduler.add_job(func=run_job, args=(app, "check_reminders", check_reminders), trigger="cron",
+                      hour=NOTIFY_TIME.hour, minute=NOTIFY_TIME.minute, id="check_reminders",
+                      replace_existing=True, coalesce=True)
+    keep = app.config.get("EXAMS_CHANGE_LOG_KEEP", CHANGE_LOG_KEEP)
+    scheduler.add_job(func=run_job, args=(app, "prune_changes", lambda: prune_exam_changes(keep)), trigger="cron",
+                      hour=3, minute=0, id="prune_changes", replace_existing=True, coalesce=True)
+    atexit.register(stop_scheduler, app)
+
+
+def stop_scheduler(app):
+    if not scheduler.running:
+        return
+    scheduler.shutdown(wait=False)
+    notifications.clear()
+    with app.app_context():
+        lease.release()
+    dispatcher.stop()
+
+
+if __name__ == "__main__":
+    # Proceso dedicado al programador, separado de los workers web.
+    app = Flask(__name__)
+    init_db(app)
+    start_scheduler(app)
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        stop_scheduler(app)
@@ -0,0 +1,98 @@
+import unicodedata
+
+SEARCH_FIELDS = ("subject", "test_type", "room")
+
+# Marcas de inicio y fin de texto: permiten buscar prefijos como subcadenas.
+START = "\x02"
+END = "\x03"
+GRAM_SIZE = 3
+
+
+def normalize(text):
+    # Minúsculas y sin acentos: "Cálculo" y "calculo" se indexan igual.
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def ngrams(text, size):
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class SearchIndex:
+    # Índice de n-gramas (hasta trigramas) por campo para búsquedas por subcadena.
+
+    def __init__(self, reminders=(), fields=SEARCH_FIELDS):
+        self.fields = fields
+        self.rebuild(reminders)
+
+    def __len__(self):
+        return len(self._reminders)
+
+    def rebuild(self, reminders):
+        self._postings = {field: {} for field in self.fields}
+        self._values = {}
+        self._reminders = {}
+        for reminder in reminders:
+            self.add(reminder)
+
+    def add(self, reminder):
+        ref = id(reminder)
+        values = {}
+        for field in self.fields:
+            text = START + normalize(getattr(reminder, field) or "") + END
+            values[field] = text
+            postings = self._postings[field]
+            for size in range(1, GRAM_SIZE + 1):
+                for gram in ngrams(text, size):
+                    postings.setdefault(gram, set()).add(ref)
+        self._values[ref] = values
+        self._reminders[ref] = reminder
+
+    def remove(self, reminder):
+        ref = id(reminder)
+        values = self._values.pop(ref, None)
+        if values is None:
+            return False
+        del self._reminders[ref]
+        for field, text in values.items():
+            postings = self._postings[field]
+            for size in range(1, GRAM_SIZE + 1):
+                for gram in ngrams(text, size):
+                    refs = postings[gram]
+                    refs.discard(ref)
+                    if not refs:
+                        del postings[gram]
+        return True
+
+    def _match(self, field, query, prefix):
+        pattern = normalize(query)
+        if prefix:
+            pattern = START + pattern
+        if not pattern:
+            return set(self._reminders)
+        size = min(GRAM_SIZE, len(pattern))
+        postings = self._postings[field]
+        candidates = None
+        for gram in sorted(ngrams(pattern, size), key=lambda g: len(postings.get(g, ()))):
+            refs = postings.get(gram)
+            if not refs:
+                return set()
+            candidates = set(refs) if candidates is None else candidates & refs
+        if len(pattern) > size:
+            # Los trigramas pueden coincidir en desorden: se confirma la subcadena.
+            candidates = {ref for ref in candidates if pattern in self._values[ref][field]}
+        return candidates
+
+    def search(self, prefix=False, **criteria):
+        # Combina los criterios (campo=texto) con intersección; se ignoran los vacíos.
+        result = None
+        for field, query in criteria.items():
+            if not query:
+                continue
+            refs = self._match(field, query, prefix)
+            result = refs if result is None else result & refs
+            if not result:
+                return []
+        if result is None:
+            return []
+        return sorted((self._reminders[ref] for ref in result), key=lambda r: r.ordinal)
@@ -0,0 +1,187 @@
+import datetime
+import json
+import mmap
+import os
+import struct
+
+from reminder_record import Priority, Reminder, Status
+
+# Formato de snapshot binario (little endian):
+#   cabecera | registros de tamaño fijo | tabla de offsets de strings | strings UTF-8
+# Los registros guardan índices a la tabla de strings, así materias, salas y tipos
+# repetidos se almacenan una sola vez. Solo se conservan los campos conocidos.
+MAGIC = b"RMSNAP"
+VERSION = 1
+SNAPSHOT_EXTENSION = ".rsnap"
+
+HEADER = struct.Struct("<6sHIIII")  # magic, versión, registros, strings, offset tabla, offset strings
+RECORD = struct.Struct("<iIIIIiB")  # fecha, materia, tipo, sala, prioridad, frecuencia, flags
+OFFSET = struct.Struct("<I")
+
+MISSING = 0xFFFFFFFF
+STRING_FIELDS = ("subject", "test_type", "room", "priority")
+HAS_COMPLETED = 1
+COMPLETED = 2
+HAS_FREQUENCY = 4
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def write_snapshot(path, reminders):
+    # reminders: registros Reminder (ver reminder_record.py).
+    strings = {}
+
+    def intern(value):
+        return strings.setdefault(str(value), len(strings))
+
+    records = []
+    for reminder in reminders:
+        flags = HAS_COMPLETED | COMPLETED if reminder.completed else 0
+        if reminder.frequency:
+            flags |= HAS_FREQUENCY
+        records.append(RECORD.pack(
+            reminder.ordinal,
+            *(intern(getattr(reminder, field)) for field in STRING_FIELDS),
+            reminder.frequency or 0,
+            flags,
+        ))
+
+    encoded = [s.encode("utf-8") for s in strings]
+    table_offset = HEADER.size + RECORD.size * len(records)
+    blob_offset = table_offset + OFFSET.size * (len(encoded) + 1)
+
+    # Temporal + fsync + rename + fsync del directorio: tras un corte de luz
+    # queda el snapshot anterior o el nuevo completo, nunca uno vacío.
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(records), len(encoded), table_offset, blob_offset))
+        f.writelines(records)
+        position = 0
+        for value in encoded:
+            f.write(OFFSET.pack(position))
+            position += len(value)
+        f.write(OFFSET.pack(position))
+        f.writelines(encoded)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    fsync_directory(os.path.dirname(os.path.abspath(path)))
+
+
+def fsync_directory(directory):
+    # Hace durable la entrada del directorio (rename, archivo nuevo). En Windows
+    # no se puede abrir un directorio así; NTFS ya registra el rename en su diario.
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class SnapshotReader:
+    # Lee un snapshot con mmap; cada registro se decodifica recién al accederlo.
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise SnapshotError(f"El archivo {path} está vacío.")
+        if len(self._map) < HEADER.size:
+            self.close()
+            raise SnapshotError(f"El archivo {path} no es un snapshot válido.")
+        magic, version, self._count, self._string_count, self._table, self._blob = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise SnapshotError(f"El archivo {path} no es un snapshot compatible.")
+        # Un archivo cortado (copia incompleta, corte de luz) no debe leerse
+        # fuera del mapa: se validan las secciones antes de usarlas.
+        table_end = self._table + OFFSET.size * (self._string_count + 1)
+        if (HEADER.size + RECORD.size * self._count > self._table or table_end > self._blob
+                or self._blob > len(self._map)
+                or self._blob + OFFSET.unpack_from(self._map, table_end - OFFSET.size)[0] > len(self._map)):
+            self.close()
+            raise SnapshotError(f"El archivo {path} está incompleto o dañado.")
+        self._strings = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._map.close()
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+    def _unpack(self, i):
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("índice de snapshot fuera de rango")
+        return RECORD.unpack_from(self._map, HEADER.size + i * RECORD.size)
+
+    def record(self, i):
+        # Decodifica directo a Reminder, sin pasar por strings de fecha.
+        ordinal, subject, test_type, room, priority, frequency, flags = self._unpack(i)
+        return Reminder(
+            self.string(subject), self.string(test_type), self.string(room), ordinal,
+            Priority.parse(self.string(priority)) if priority != MISSING else Priority.BAJA,
+            Status.COMPLETADO if flags & COMPLETED else Status.PENDIENTE,
+            frequency if flags & HAS_FREQUENCY and frequency else None,
+        )
+
+    def records(self):
+        for i in range(self._count):
+            yield self.record(i)
+
+    def __getitem__(self, i):
+        ordinal, *indexes, frequency, flags = self._unpack(i)
+        reminder = {}
+        for field, index in zip(STRING_FIELDS, indexes):
+            if field == "priority":
+                # Mismo orden de claves que los recordatorios creados en app.py.
+                reminder["date"] = datetime.date.fromordinal(ordinal).strftime("%Y-%m-%d")
+            if index != MISSING:
+                reminder[field] = self.string(index)
+        if flags & HAS_FREQUENCY:
+            reminder["frequency"] = frequency
+        if flags & HAS_COMPLETED:
+            reminder["completed"] = bool(flags & COMPLETED)
+        return reminder
+
+    def string(self, index):
+        value = self._strings.get(index)
+        if value is None:
+            if index >= self._string_count:
+                raise SnapshotError(f"Índice de string {index} fuera de la tabla del snapshot.")
+            start, end = struct.unpack_from("<II", self._map, self._table + index * OFFSET.size)
+            value = self._map[self._blob + start:self._blob + end].decode("utf-8")
+            self._strings[index] = value
+        return value
+
+
+def open_snapshot(path):
+    return SnapshotReader(path)
+
+
+# Conversión entre snapshots y el formato backup.json existente.
+def json_to_snapshot(json_path, snapshot_path):
+    with open(json_path, "r") as f:
+        write_snapshot(snapshot_path, [Reminder.from_dict(data) for data in json.load(f)])
+
+
+def snapshot_to_json(snapshot_path, json_path):
+    with open_snapshot(snapshot_path) as snapshot, open(json_path, "w") as f:
+        json.dump(list(snapshot), f, indent=4, default=str)
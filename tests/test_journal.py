@@ -0,0 +1,232 @@
+import datetime
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from journal import Journal, JournalError  # noqa: E402
+from reminder_record import Priority, Reminder  # noqa: E402
+from snapshot import SNAPSHOT_EXTENSION, write_snapshot  # noqa: E402
+from user_shards import UserShard  # noqa: E402
+
+DAY = datetime.date(2026, 3, 2).toordinal()
+
+
+def reminder(subject, days=0, frequency=None):
+    return Reminder(subject, "Examen", "A-101", DAY + days, Priority.BAJA, frequency=frequency)
+
+
+def as_dicts(reminders):
+    return [r.to_dict() for r in reminders]
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self._tmp.name, "usuario")
+        self.legacy = os.path.join(self._tmp.name, "usuario" + SNAPSHOT_EXTENSION)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def journal(self, **kwargs):
+        kwargs.setdefault("fsync_interval", None)
+        return Journal(self.directory, legacy_snapshot=self.legacy, **kwargs)
+
+    def shard(self, **kwargs):
+        journal = self.journal(**kwargs)
+        return UserShard("usuario", journal, journal.load())
+
+    def reload(self):
+        journal = self.journal()
+        try:
+            return as_dicts(journal.load())
+        finally:
+            journal.close()
+
+    def files(self):
+        return sorted(os.listdir(self.directory))
+
+    def test_replay_applies_every_operation_in_order(self):
+        shard = self.shard()
+        shard.append(reminder("Cálculo"))
+        shard.append(reminder("Física", 3, frequency=7))
+        shard.append(reminder("Química", 5))
+        shard.replace(0, reminder("Cálculo II", 1))
+        shard.complete(1)
+        shard.delete(2)
+        expected = as_dicts(shard.reminders)
+        shard.close()
+        self.assertEqual(self.reload(), expected)
+
+    def test_replay_survives_several_sessions(self):
+        shard = self.shard()
+        shard.append(reminder("Cálculo"))
+        shard.close()
+        shard = self.shard()
+        shard.append(reminder("Física", 1))
+        shard.delete(0)
+        expected = as_dicts(shard.reminders)
+        shard.close()
+        self.assertEqual(self.reload(), expected)
+        self.assertEqual(expected, [reminder("Física", 1).to_dict()])
+
+    def test_torn_last_line_is_ignored(self):
+        shard = self.shard()
+        shard.append(reminder("Cálculo"))
+        shard.append(reminder("Física", 1))
+        expected = as_dicts(shard.reminders)
+        journal_path = shard.journal._file.name
+        shard.close()
+        # Cierre abrupto a mitad de la escritura del tercer cambio.
+        with open(journal_path, "a", encoding="utf-8") as f:
+            f.write('{"seq": 3, "op": "add", "reminder": {"subject": "Quím')
+        self.assertEqual(self.reload(), expected)
+
+    def test_changes_after_a_torn_line_are_kept(self):
+        shard = self.shard()
+        shard.append(reminder("Cálculo"))
+        journal_path = shard.journal._file.name
+        shard.close()
+        with open(journal_path, "a", encoding="utf-8") as f:
+            f.write('{"seq": 2, "op": "ad')
+        shard = self.shard()
+        shard.append(reminder("Física", 1))
+        expected = as_dicts(shard.reminders)
+        shard.close()
+        self.assertEqual(self.reload(), expected)
+        self.assertEqual(len(expected), 2)
+
+    def test_invalid_entry_raises_journal_error(self):
+        shard = self.shard()
+        shard.append(reminder("Cálculo"))
+        journal_path = shard.journal._file.name
+        shard.close()
+        with open(journal_path, "a", encoding="utf-8") as f:
+            f.write('{"seq": 2, "op": "delete", "index": 5}\n')
+        with self.assertRaises(JournalError):
+            self.journal().load()
+
+    def test_compaction_replaces_journals_with_a_snapshot(self):
+        shard = self.shard(compact_bytes=1)
+        shard.append(reminder("Cálculo"))
+        shard.journal._compaction.join()
+        shard.append(reminder("Física", 1))
+        shard.journal._compaction.join()
+        expected = as_dicts(shard.reminders)
+        shard.close()
+        files = self.files()
+        self.assertEqual([name for name in files if name.endswith(SNAPSHOT_EXTENSION)],
+                         [f"snapshot-{2:012d}{SNAPSHOT_EXTENSION}"])
+        self.assertFalse([name for name in files if name.endswith(".tmp")])
+        self.assertEqual(self.reload(), expected)
+
+    def test_snapshot_is_durable_before_journals_are_deleted(self):
+        shard = self.shard()
+        shard.append(reminder("Cálculo"))
+        calls = []
+        real_fsync, real_replace, real_remove = os.fsync, os.replace, os.remove
+
+        def fsync(fd):
+            calls.append(("fsync", os.path.isdir(f"/proc/self/fd/{fd}") if os.path.exists("/proc/self/fd") else None))
+            real_fsync(fd)
+
+        def replace(src, dst):
+            calls.append(("replace", os.path.basename(dst)))
+            real_replace(src, dst)
+
+        def remove(path):
+            calls.append(("remove", os.path.basename(path)))
+            real_remove(path)
+
+        with mock.patch("os.fsync", fsync), mock.patch("os.replace", replace), mock.patch("os.remove", remove):
+            shard.journal._write_snapshot(list(shard.reminders), shard.journal.seq)
+        shard.close()
+        ops = [op for op, _ in calls]
+        replaced = ops.index("replace")
+        removed = ops.index("remove")
+        # fsync del temporal, rename, fsync del directorio y recién entonces los borrados.
+        self.assertIn("fsync", ops[:replaced])
+        self.assertIn("fsync", ops[replaced:removed])
+        if os.path.exists("/proc/self/fd"):
+            self.assertIn(("fsync", True), calls[replaced:removed])
+
+    def test_crash_before_snapshot_is_written(self):
+        shard = self.shard()
+        shard.append(reminder("Cálculo"))
+        shard.journal._write_snapshot = lambda records, upto: None
+        shard.journal.compact(shard.reminders)
+        shard.journal._compaction.join()
+        shard.append(reminder("Física", 1))
+        expected = as_dicts(shard.reminders)
+        shard.close()
+        # Quedan los dos diarios y ningún snapshot: se reconstruye desde ellos.
+        self.assertFalse([name for name in self.files() if name.endswith(SNAPSHOT_EXTENSION)])
+        self.assertEqual(self.reload(), expected)
+
+    def test_crash_while_writing_snapshot_leaves_a_temp_file(self):
+        shard = self.shard()
+        shard.append(reminder("Cálculo"))
+        shard.append(reminder("Física", 1))
+        expected = as_dicts(shard.reminders)
+        shard.close()
+        with open(os.path.join(self.directory, f"snapshot-{2:012d}{SNAPSHOT_EXTENSION}.tmp"), "wb") as f:
+            f.write(b"RMSNAP")
+        self.assertEqual(self.reload(), expected)
+        self.assertFalse([name for name in self.files() if name.endswith(".tmp")])
+
+    def test_crash_before_old_journals_are_deleted(self):
+        shard = self.shard()
+        shard.append(reminder("Cálculo"))
+        shard.append(reminder("Física", 1))
+        shard.append(reminder("Química", 2))
+        shard.delete(0)
+        expected = as_dicts(shard.reminders)
+        shard.close()
+        # El snapshot cubre los cuatro cambios pero el diario no llegó a borrarse:
+        # no se deben aplicar dos veces.
+        write_snapshot(os.path.join(self.directory, f"snapshot-{4:012d}{SNAPSHOT_EXTENSION}"),
+                       [reminder("Física", 1), reminder("Química", 2)])
+        self.assertEqual(self.reload(), expected)
+
+    def test_crash_before_old_snapshot_is_deleted(self):
+        shard = self.shard()
+        shard.append(reminder("Cálculo"))
+        shard.journal.compact(shard.reminders)
+        shard.journal._compaction.join()
+        shard.append(reminder("Física", 1))
+        shard.journal.compact(shard.reminders)
+        shard.journal._compaction.join()
+        expected = as_dicts(shard.reminders)
+        shard.close()
+        write_snapshot(os.path.join(self.directory, f"snapshot-{1:012d}{SNAPSHOT_EXTENSION}"), [reminder("Viejo")])
+        self.assertEqual(self.reload(), expected)
+
+    def test_reset_is_durable_before_returning(self):
+        shard = self.shard()
+        shard.append(reminder("Cálculo"))
+        shard.reset([reminder("Respaldo", 4)])
+        shard.append(reminder("Física", 1))
+        expected = as_dicts(shard.reminders)
+        shard.close()
+        self.assertEqual(self.reload(), expected)
+        self.assertEqual([r["subject"] for r in expected], ["Respaldo", "Física"])
+
+    def test_legacy_snapshot_is_loaded_and_removed_after_compaction(self):
+        write_snapshot(self.legacy, [reminder("Antiguo")])
+        shard = self.shard()
+        self.assertEqual([r.subject for r in shard.reminders], ["Antiguo"])
+        shard.append(reminder("Cálculo"))
+        shard.journal.compact(shard.reminders)
+        shard.journal._compaction.join()
+        expected = as_dicts(shard.reminders)
+        shard.close()
+        self.assertFalse(os.path.exists(self.legacy))
+        self.assertEqual(self.reload(), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import datetime
+import importlib.util
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+HAS_WEB = all(importlib.util.find_spec(name) for name in ("flask_sqlalchemy", "apscheduler"))
+
+if HAS_WEB:
+    # web.py configura la app al importarse: la base temporal y las variables
+    # tienen que estar antes del import.
+    _TMP = tempfile.TemporaryDirectory()
+    os.environ["EXAMS_DATABASE_URI"] = "sqlite:///" + os.path.join(_TMP.name, "exams.db")
+    os.environ["EXAMS_SCHEDULER"] = "0"
+    os.environ.setdefault("SECRET_KEY", "pruebas")
+    import scheduler  # noqa: E402
+    import web  # noqa: E402
+    from database import Exam, db  # noqa: E402
+    from sqlalchemy import delete, text  # noqa: E402
+
+
+def in_days(days):
+    return (datetime.date.today() + datetime.timedelta(days=days)).isoformat()
+
+
+@unittest.skipUnless(HAS_WEB, "requiere flask_sqlalchemy y apscheduler")
+class NotificationScheduleTest(unittest.TestCase):
+    def setUp(self):
+        self.client = web.app.test_client()
+        with web.app.app_context():
+            db.session.execute(delete(Exam))
+            db.session.commit()
+        scheduler.notifications.clear()
+        scheduler.heartbeat(web.app)
+        self.assertTrue(scheduler.notifications.active)
+
+    def tearDown(self):
+        scheduler.notifications.clear()
+        with web.app.app_context():
+            scheduler.lease.release()
+
+    def batch(self, **body):
+        return self.client.post("/api/v1/exams/batch", json=body)
+
+    def scheduled(self):
+        # Exámenes con al menos un aviso vigente en el heap, con su fecha.
+        schedule = scheduler.notifications
+        live = {exam_id for _, exam_id, _, version in schedule._heap if schedule._versions.get(exam_id) == version}
+        return {exam_id: schedule._exams[exam_id][1].isoformat() for exam_id in live}
+
+    def exam(self, days, subject="Cálculo"):
+        return {"subject": subject, "test_type": "Examen", "room": "A-101", "date": in_days(days)}
+
+    def test_committed_changes_reach_the_queue(self):
+        created = self.batch(create=[self.exam(7)]).json["created"]
+        self.assertEqual(self.scheduled(), {created[0]: in_days(7)})
+        self.batch(update=[{"id": created[0], "date": in_days(30)}])
+        self.assertEqual(self.scheduled(), {created[0]: in_days(30)})
+        self.batch(delete=created)
+        self.assertEqual(self.scheduled(), {})
+
+    def test_rolled_back_create_is_not_scheduled(self):
+        # owned_exam hace autoflush del create antes de fallar con el update.
+        response = self.batch(create=[self.exam(1, "Fantasma")], update=[{"id": 999, "completed": True}])
+        self.assertEqual(response.status_code, 404)
+        with web.app.app_context():
+            self.assertEqual(Exam.query.count(), 0)
+        self.assertEqual(self.scheduled(), {})
+
+    def test_rolled_back_update_keeps_the_committed_date(self):
+        exam_id = self.batch(create=[self.exam(7)]).json["created"][0]
+        response = self.batch(update=[{"id": exam_id, "date": in_days(30)}], delete=[999])
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.scheduled(), {exam_id: in_days(7)})
+
+    def test_heartbeat_after_a_rolled_back_write(self):
+        exam_id = self.batch(create=[self.exam(7)]).json["created"][0]
+        scheduler.heartbeat(web.app)
+        self.batch(update=[{"id": exam_id, "date": in_days(30)}], delete=[999])
+        with mock.patch.object(scheduler.notifications, "load") as load:
+            scheduler.heartbeat(web.app)
+        load.assert_not_called()
+        self.assertEqual(self.scheduled(), {exam_id: in_days(7)})
+        with web.app.app_context():
+            self.assertEqual(scheduler.notifications.loaded_version, scheduler.exam_version())
+
+    def test_heartbeat_applies_other_processes_writes_after_a_rollback(self):
+        exam_id = self.batch(create=[self.exam(7)]).json["created"][0]
+        scheduler.heartbeat(web.app)
+        # La versión que usó la transacción revertida la reutiliza otro proceso.
+        self.batch(create=[self.exam(2, "Fantasma")], delete=[999])
+        with web.app.app_context():
+            with db.engine.begin() as conn:
+                conn.execute(text("UPDATE exam SET date = :date WHERE id = :id"), {"date": in_days(14), "id": exam_id})
+        scheduler.heartbeat(web.app)
+        self.assertEqual(self.scheduled(), {exam_id: in_days(14)})
+
+    def test_changes_while_firing_are_sent_in_the_same_run(self):
+        sent = []
+        schedule = scheduler.notifications
+        today = datetime.date.today()
+
+        def notify(exam_id, name, test_type, room, exam_date, days_left):
+            sent.append(name)
+            if name == "Primero":
+                schedule.apply_changes([(2, ("Segundo", "Examen", "A-101"), today)], [])
+
+        with mock.patch.object(scheduler, "NOTIFY_TIME", datetime.time(0, 0)), \
+                mock.patch.object(schedule, "notify", notify), \
+                mock.patch.object(schedule.scheduler, "add_job") as add_job:
+            schedule.apply_changes([(1, ("Primero", "Examen", "A-101"), today)], [])
+            add_job.reset_mock()
+            self.assertEqual(schedule.fire_due(), 2)
+        self.assertEqual(sent, ["Primero", "Segundo"])
+        # Durante el envío no se reprogramó el job.
+        add_job.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
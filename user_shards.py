@@ -0,0 +1,143 @@
+import collections
+import os
+import time
+import urllib.parse
+
+from conflicts import RoomDateIndex
+from journal import Journal
+from reminder_record import Reminder, Status
+from reminder_store import ReminderIndex
+from search_index import SearchIndex
+from snapshot import SNAPSHOT_EXTENSION
+
+# Recordatorios particionados por usuario: cada usuario tiene su directorio
+# (snapshot + diario) y sus índices, y solo se cargan en memoria los usuarios
+# que se están usando.
+DATA_DIR = os.environ.get("EXAMS_DATA_DIR", os.path.join(os.path.expanduser("~"), ".recordatorios"))
+MAX_SHARDS = 8
+IDLE_SECONDS = 15 * 60
+
+
+def shard_dir(data_dir, user):
+    return os.path.join(data_dir, urllib.parse.quote(user, safe=""))
+
+
+def shard_path(data_dir, user):
+    # Archivo único de versiones anteriores; se lee si el usuario aún no tiene directorio.
+    return shard_dir(data_dir, user) + SNAPSHOT_EXTENSION
+
+
+class UserShard:
+    # Recordatorios de un usuario con sus tres índices. Todos los cambios pasan
+    # por estos métodos, que mantienen los índices y anotan el cambio en el
+    # diario. journal=None es un shard solo en memoria.
+
+    def __init__(self, user, journal=None, reminders=()):
+        self.user = user
+        self.journal = journal
+        self.reminders = list(reminders)
+        self.reminder_index = ReminderIndex(self.reminders)
+        self.search_index = SearchIndex(self.reminders)
+        self.room_index = RoomDateIndex(self.reminders)
+        self.last_used = time.monotonic()
+
+    def _index(self, reminder):
+        self.reminder_index.add(reminder)
+        self.search_index.add(reminder)
+        self.room_index.add(reminder)
+
+    def _unindex(self, reminder):
+        self.reminder_index.remove(reminder)
+        self.search_index.remove(reminder)
+        self.room_index.remove(reminder)
+
+    def _record(self, op, index=None, reminder=None):
+        if self.journal is not None and self.journal.record(op, index, reminder):
+            self.journal.compact(self.reminders)
+
+    def append(self, reminder):
+        self.reminders.append(reminder)
+        self._index(reminder)
+        self._record("add", reminder=reminder)
+
+    def replace(self, index, reminder):
+        self._unindex(self.reminders[index])
+        self.reminders[index] = reminder
+        self._index(reminder)
+        self._record("edit", index, reminder)
+
+    def delete(self, index):
+        self._unindex(self.reminders.pop(index))
+        self._record("delete", index)
+
+    def complete(self, index):
+        # Se reemplaza el registro en vez de modificarlo, así la compactación en
+        # segundo plano puede escribir una copia de la lista sin que cambie.
+        old = self.reminders[index]
+        done = Reminder(old.subject, old.test_type, old.room, old.ordinal, old.priority, Status.COMPLETADO,
+                        old.frequency)
+        self._unindex(old)
+        self.reminders[index] = done
+        self._index(done)
+        self._record("complete", index)
+
+    def reset(self, reminders):
+        self.reminders[:] = reminders
+        self.reminder_index.rebuild(self.reminders)
+        self.search_index.rebuild(self.reminders)
+        self.room_index.rebuild(self.reminders)
+        if self.journal is not None:
+            self.journal.compact(self.reminders, reset=True)
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+
+
+class ShardStore:
+    # Carga perezosa al primer acceso; los shards que superan idle_seconds sin
+    # uso, o los más antiguos si hay más de max_shards, se cierran y se descargan.
+
+    def __init__(self, data_dir=DATA_DIR, max_shards=MAX_SHARDS, idle_seconds=IDLE_SECONDS):
+        self.data_dir = data_dir
+        self.max_shards = max_shards
+        self.idle_seconds = idle_seconds
+        self._shards = collections.OrderedDict()
+
+    def __contains__(self, user):
+        return user in self._shards
+
+    def get(self, user):
+        now = time.monotonic()
+        self.evict_idle(now, keep=user)
+        shard = self._shards.get(user)
+        if shard is None:
+            shard = self._shards[user] = self._load(user)
+            while len(self._shards) > self.max_shards:
+                self.evict(next(iter(self._shards)))
+        self._shards.move_to_end(user)
+        shard.last_used = now
+        return shard
+
+    def _load(self, user):
+        journal = Journal(shard_dir(self.data_dir, user), legacy_snapshot=shard_path(self.data_dir, user))
+        return UserShard(user, journal, journal.load())
+
+    def evict(self, user):
+        shard = self._shards.pop(user, None)
+        if shard is not None:
+            shard.close()
+        return shard
+
+    def evict_idle(self, now=None, keep=None):
+        now = time.monotonic() if now is None else now
+        idle = [user for user, shard in self._shards.items()
+                if user != keep and now - shard.last_used > self.idle_seconds]
+        for user in idle:
+            self.evict(user)
+        return idle
+
+    def close(self):
+        for shard in self._shards.values():
+            shard.close()
+        self._shards.clear()
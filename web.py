@@ -0,0 +1,286 @@
+import datetime
+import io
+import os
+import urllib.parse
+
+import click
+from flask import (Flask, Response, abort, flash, jsonify, make_response, redirect, render_template, request,
+                   stream_with_context, url_for)
+
+from api import api
+from app import Colors
+from bulk_import import DEFAULT_BATCH_SIZE, detect_format, import_exams
+from conflicts import DEFAULT_MAX_PER_DAY, day_overloads, room_clashes
+from database import (Exam, completed_exams, current_owner, db, decode_cursor, exam_version, exams_between,
+                      exams_by_room_date, exams_by_subject_prefix, exams_filtered, exams_in_room, exams_page, init_db,
+                      parse_exam_fields, pending_exams, run_write)
+from ics_export import exam_events, iter_ics
+from metrics import REGISTRY, instrument_app, instrument_engine
+from query_cache import DEFAULT_MAXSIZE, QueryCache, exam_rows
+from scheduler import start_scheduler
+
+# Aplicación web. Vive aparte del CLI para que app.py arranque sin cargar
+# Flask ni SQLAlchemy; se usa con `flask --app web run` (o `--app app`).
+app = Flask(__name__)
+# Sin una clave propia cualquiera podría firmar una cookie de sesión válida.
+app.secret_key = os.environ.get("SECRET_KEY")
+if not app.secret_key:
+    raise RuntimeError("Falta la variable de entorno SECRET_KEY para firmar las sesiones.")
+# Solo detrás de un proxy que autentica y fija la cabecera X-Exams-User.
+app.config.setdefault("EXAMS_TRUST_USER_HEADER", os.environ.get("EXAMS_TRUST_USER_HEADER") == "1")
+app.config.setdefault("EXAMS_PER_PAGE", 50)
+app.config.setdefault("EXAMS_MAX_PER_PAGE", 500)
+app.config.setdefault("EXAMS_MAX_UPCOMING_DAYS", 3660)
+app.config.setdefault("EXAMS_QUERY_CACHE_SIZE", DEFAULT_MAXSIZE)
+app.config.setdefault("EXAMS_SLOW_REQUEST_MS", float(os.environ.get("EXAMS_SLOW_REQUEST_MS", 0)) or None)
+init_db(app)
+app.register_blueprint(api)
+query_cache = QueryCache(app.config["EXAMS_QUERY_CACHE_SIZE"])
+instrument_app(app, app.config["EXAMS_SLOW_REQUEST_MS"])
+with app.app_context():
+    instrument_engine(db.engine)
+# EXAMS_SCHEDULER=0 deja el proceso sin programador (comandos flask, benchmarks).
+if os.environ.get("EXAMS_SCHEDULER", "1") != "0":
+    start_scheduler(app)
+
+
+# Renderiza una página de exámenes. El ETag depende del contador de cambios de la
+# tabla, así una recarga sin cambios responde 304 sin consultar ni renderizar.
+# Las páginas consultadas se guardan en query_cache con la misma versión en la clave.
+def render_exam_page(query, **context):
+    version = exam_version()
+    today = datetime.date.today().isoformat()
+    owner = current_owner()
+    etag = f"exams-{version}-{today}-{urllib.parse.quote(owner)}"
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        try:
+            after = decode_cursor(request.args['after']) if request.args.get('after') else None
+        except ValueError:
+            abort(400)
+        per_page = request.args.get('per_page', app.config['EXAMS_PER_PAGE'], type=int)
+        per_page = max(1, min(per_page, app.config['EXAMS_MAX_PER_PAGE']))
+        key = (owner, request.endpoint, tuple(sorted(request.view_args.items())),
+               tuple(sorted(request.args.items(multi=True))), per_page, version, today)
+
+        def compute():
+            exams, next_cursor = exams_page(query, after, per_page)
+            return exam_rows(exams), next_cursor
+
+        exams, next_cursor = query_cache.get_or_compute(key, compute)
+        args = {key: value for key, value in request.args.items() if key != 'after'}
+        first_url = url_for(request.endpoint, **request.view_args, **args) if after else None
+        next_url = url_for(request.endpoint, **request.view_args, **args, after=next_cursor) if next_cursor else None
+        response = make_response(render_template('index.html', exams=exams, first_url=first_url, next_url=next_url,
+                                                 **context))
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+
+# Ruta principal
+@app.route('/')
+def index():
+    exams = pending_exams(current_owner())
+    subject = request.args.get('subject')
+    if subject:
+        exams = exams_by_subject_prefix(subject, exams)
+    return render_exam_page(exams)
+
+
+# Rutas para agregar un recordatorio
+@app.route('/add_reminder', methods=['GET', 'POST'])
+def add_exam():
+    if request.method == 'POST':
+        try:
+            fields = parse_exam_fields(request.form)
+        except ValueError as e:
+            print(f"{Colors.FAIL}{e}{Colors.END}")
+            flash(str(e), 'error')
+            return redirect(url_for('index'))
+
+        owner = current_owner()
+        clashes = exams_in_room(fields['room'], fields['date']).all()
+        try:
+            run_write(lambda: db.session.add(Exam(**fields, owner=owner)))
+            flash('Recordatorio agregado con éxito.', 'success')
+            if clashes:
+                # De los exámenes de otros usuarios solo se informa que la sala está ocupada.
+                names = [exam.name for exam in clashes if exam.owner == owner]
+                others = len(clashes) - len(names)
+                if others:
+                    names.append(f"{others} examen(es) de otros usuarios")
+                flash(f"Atención: la sala {fields['room']} ya está ocupada ese día por: {', '.join(names)}.", 'warning')
+        except Exception as e:
+            print(f"{Colors.FAIL}Error al agregar el recordatorio: {e}{Colors.END}")
+    return redirect(url_for('index'))
+
+
+def owned_exam(id, owner):
+    exam = db.session.get(Exam, id)
+    return exam if exam is not None and exam.owner == owner else None
+
+
+@app.route('/delete/<int:id>')
+def delete_exam(id):
+    owner = current_owner()
+
+    def delete():
+        exam = owned_exam(id, owner)
+        if exam:
+            db.session.delete(exam)
+        return exam is not None
+
+    try:
+        if run_write(delete):
+            flash('Recordatorio eliminado con éxito.', 'success')
+    except Exception as e:
+        print(f"{Colors.FAIL}Error al eliminar el recordatorio: {e}{Colors.END}")
+    return redirect(url_for('index'))
+
+
+@app.route('/completed/<int:id>')
+def complete_reminder(id):
+    owner = current_owner()
+
+    def complete():
+        reminder = owned_exam(id, owner)
+        if reminder:
+            reminder.completed = True
+        return reminder is not None
+
+    try:
+        if run_write(complete):
+            flash('Recordatorio completado con éxito.', 'success')
+    except Exception as e:
+        print(f"{Colors.FAIL}Error al completar el recordatorio: {e}{Colors.END}")
+    return redirect(url_for('index'))
+
+@app.route('/show_completed')
+def show_completed():
+    return render_exam_page(completed_exams(current_owner()), completed=True)
+
+
+# Importación masiva de exámenes desde CSV o JSON Lines
+@app.route('/import_exams', methods=['POST'])
+def import_exams_route():
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify(error="Falta el archivo a importar."), 400
+    try:
+        fmt = detect_format(upload.filename)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    batch_size = request.form.get('batch_size', DEFAULT_BATCH_SIZE, type=int)
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+    report = import_exams(stream, fmt, batch_size=max(1, batch_size), owner=current_owner())
+    return jsonify(report.to_dict())
+
+
+@app.cli.command('import-exams')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, show_default=True, type=click.IntRange(min=1))
+@click.option('--owner', default="", help="usuario dueño de los exámenes importados")
+def import_exams_command(path, batch_size, owner):
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        report = import_exams(f, detect_format(path), batch_size=batch_size, owner=owner)
+    for line, message in report.errors:
+        print(f"{Colors.FAIL}Línea {line}: {message}{Colors.END}")
+    print(f"{Colors.GREEN}{report.imported} exámenes importados, {len(report.errors)} con errores.{Colors.END}")
+
+
+# Exportación del calendario en formato iCalendar, enviada por partes
+@app.route('/export_calendar')
+def export_calendar():
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        start = datetime.date.fromisoformat(start) if start else None
+        end = datetime.date.fromisoformat(end) if end else None
+    except ValueError:
+        abort(400)
+    query = exams_filtered(start, end, request.args.get('subject'), current_owner())
+    return Response(
+        stream_with_context(iter_ics(exam_events(query))),
+        mimetype='text/calendar',
+        headers={'Content-Disposition': 'attachment; filename=examenes.ics'},
+    )
+
+
+@app.cli.command('export-ics')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--start', type=click.DateTime(formats=["%Y-%m-%d"]), default=None)
+@click.option('--end', type=click.DateTime(formats=["%Y-%m-%d"]), default=None)
+@click.option('--subject', default=None)
+@click.option('--owner', default=None, help="exporta solo los exámenes de este usuario")
+def export_ics_command(path, start, end, subject, owner):
+    query = exams_filtered(start and start.date(), end and end.date(), subject, owner)
+    with open(path, "w", newline="") as f:
+        f.writelines(iter_ics(exam_events(query)))
+    print(f"{Colors.GREEN}Calendario exportado a {path} con éxito.{Colors.END}")
+
+
+# Reporte de choques de sala (entre todos los usuarios, las salas son compartidas)
+# y de días sobrecargados del usuario actual. De los exámenes de otros usuarios
+# solo se da la cantidad.
+@app.route('/conflicts')
+def conflicts():
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        start = datetime.date.fromisoformat(start) if start else datetime.date.today()
+        end = datetime.date.fromisoformat(end) if end else None
+    except ValueError:
+        abort(400)
+    max_per_day = max(1, request.args.get('max_per_day', DEFAULT_MAX_PER_DAY, type=int))
+    owner = current_owner()
+
+    def exam_entry(exam):
+        return {"id": exam.id, "subject": exam.name, "test_type": exam.test_type, "room": exam.room}
+
+    # Ambas consultas llegan ordenadas desde SQL (por room_key, la misma
+    # normalización que usa room_clashes), así el barrido es lineal.
+    by_room = ((exam.date, exam.room, exam) for exam in exams_by_room_date(start, end).yield_per(500))
+    clashes = [{"room": room, "date": date.isoformat(),
+                "exams": [exam_entry(e) for e in exams if e.owner == owner],
+                "other_exams": sum(1 for e in exams if e.owner != owner)}
+               for room, date, exams in room_clashes(by_room, presorted=True)]
+    by_date = ((exam.date, exam.room, exam) for exam in exams_between(start, end, owner=owner).yield_per(500))
+    overloads = [{"date": date.isoformat(), "count": len(exams), "exams": [exam_entry(e) for e in exams]}
+                 for date, exams in day_overloads(by_date, max_per_day, presorted=True)]
+    return jsonify(room_clashes=clashes, overloads=overloads)
+
+
+@app.route('/upcoming_exams')
+def upcoming_exams():
+    days = request.args.get('days', 7, type=int)
+    days = max(0, min(days, app.config['EXAMS_MAX_UPCOMING_DAYS']))
+    today = datetime.date.today()
+    return render_exam_page(exams_between(today, today + datetime.timedelta(days=days), owner=current_owner()))
+
+
+@app.route('/cache_stats')
+def cache_stats():
+    return jsonify(query_cache.stats())
+
+
+CACHE_EVENTS = REGISTRY.counter("exams_query_cache_events_total", "Aciertos y fallos de la caché de consultas.",
+                                ("result",))
+CACHE_SIZE = REGISTRY.gauge("exams_query_cache_entries", "Entradas en la caché de consultas.")
+
+
+def collect_cache_stats():
+    stats = query_cache.stats()
+    CACHE_EVENTS.set(stats["hits"], "hit")
+    CACHE_EVENTS.set(stats["misses"], "miss")
+    CACHE_SIZE.set(stats["size"])
+
+
+REGISTRY.add_collector(collect_cache_stats)
+
+
+# Métricas en el formato de texto de Prometheus.
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')